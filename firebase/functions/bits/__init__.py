@@ -1,3 +1,8 @@
-from .transcripts import generate_transcript
-
+# Handler modules are loaded on first access so importing one stage doesn't pull in the others
 __all__ = ['generate_transcript']
+
+def __getattr__(name):
+    if name == 'generate_transcript':
+        from .transcripts import generate_transcript
+        return generate_transcript
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,76 @@
+import logging
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+import ffmpeg
+from .tracing import record, span, wait_with_usage
+
+# Configure logging
+logger = logging.getLogger('audio_extract')
+logger.setLevel(logging.INFO)
+
+CHUNK_SIZE = 64 * 1024
+# Audio larger than this spills from memory to a temp file
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Whisper resamples to 16 kHz mono internally, so anything more is wasted upload
+AUDIO_FORMATS = {
+    'opus': {
+        'extension': 'ogg',
+        'output_args': {'acodec': 'libopus', 'b:a': '24k', 'application': 'voip', 'f': 'ogg'},
+    },
+    'flac': {
+        'extension': 'flac',
+        'output_args': {'acodec': 'flac', 'f': 'flac'},
+    },
+}
+DEFAULT_AUDIO_FORMAT = 'opus'
+
+def extract_audio(video_path: str, audio_format: str = DEFAULT_AUDIO_FORMAT, start_time: float = 0.0,
+                  duration: Optional[float] = None,
+                  workspace_dir: Optional[str] = None) -> Tuple[tempfile.SpooledTemporaryFile, str, Dict]:
+    """
+    Pipe the audio track of video_path through ffmpeg as mono 16 kHz audio,
+    optionally only the range starting at start_time and lasting duration seconds.
+    Audio that outgrows memory spills into workspace_dir (the system temp dir by default).
+    Returns (file object positioned at 0, filename for the upload, stats).
+    The caller owns the file object and should close it.
+    """
+    settings = AUDIO_FORMATS[audio_format]
+    input_args = {'ss': start_time} if start_time else {}
+    if duration is not None:
+        input_args['t'] = duration
+    with span('extract', start=start_time):
+        start = time.perf_counter()
+        process = (
+            ffmpeg
+            .input(video_path, **input_args)
+            .audio
+            .output('pipe:', ac=1, ar=16000, **settings['output_args'])
+            .global_args('-loglevel', 'error')
+            .run_async(pipe_stdout=True, pipe_stderr=True)
+        )
+        audio_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, dir=workspace_dir)
+        size = 0
+        while True:
+            chunk = process.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            audio_file.write(chunk)
+            size += len(chunk)
+        err = process.stderr.read()
+        returncode, cpu_seconds = wait_with_usage(process)
+        if returncode != 0:
+            audio_file.close()
+            raise ffmpeg.Error('ffmpeg', None, err)
+        audio_file.seek(0)
+
+        stats = {
+            'format': audio_format,
+            'bytes': size,
+            'seconds': time.perf_counter() - start,
+            'cpuSeconds': cpu_seconds,
+        }
+        record(bytes=size)
+        logger.info(f"Extracted {size} bytes of {audio_format} audio in {stats['seconds']:.2f}s")
+        return audio_file, f"audio.{settings['extension']}", stats
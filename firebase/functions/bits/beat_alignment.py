@@ -0,0 +1,111 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+# Rarest script tokens used to vote for where a beat starts
+ANCHOR_COUNT = 5
+# Extra transcript words around a candidate span handed to the fine-grained matcher
+WINDOW_PADDING = 8
+# Beats matching less than this share of their script tokens are left unaligned
+MIN_MATCH_RATIO = 0.5
+
+_NON_WORD = re.compile(r"[^\w']+")
+
+def normalize_token(word: str) -> str:
+    """Lowercase and strip punctuation so 'Wait,' matches 'wait'."""
+    return _NON_WORD.sub('', word.lower()).strip("'")
+
+def tokenize(script: str) -> List[str]:
+    return [token for token in (normalize_token(word) for word in script.split()) if token]
+
+def trim_stray_blocks(blocks: List, max_gap: int = 3) -> List:
+    """Drop single-word matches at either edge that sit apart from the rest (e.g. a stray 'the')."""
+    while len(blocks) > 1 and blocks[0].size == 1 and blocks[1].a - blocks[0].a > max_gap:
+        blocks = blocks[1:]
+    while len(blocks) > 1 and blocks[-1].size == 1 and blocks[-1].a - (blocks[-2].a + blocks[-2].size) >= max_gap:
+        blocks = blocks[:-1]
+    return blocks
+
+class WordIndex:
+    """Word timings indexed once for token lookups and time-range queries."""
+
+    def __init__(self, word_timings: List[Dict]):
+        self.words = word_timings
+        self.tokens = [normalize_token(word['word']) for word in word_timings]
+        self.starts = [word['start'] for word in word_timings]
+        # Running max of end times keeps range queries correct even if ends overlap
+        self.max_ends = []
+        running = float('-inf')
+        for word in word_timings:
+            running = max(running, word['end'])
+            self.max_ends.append(running)
+        self.positions = defaultdict(list)
+        for position, token in enumerate(self.tokens):
+            self.positions[token].append(position)
+        self.frequency = Counter(self.tokens)
+
+    def words_between(self, start_time: float, end_time: float) -> List[Dict]:
+        """Words overlapping [start_time, end_time], found with two bisects."""
+        lo = bisect_left(self.max_ends, start_time)
+        hi = bisect_right(self.starts, end_time)
+        return [word for word in self.words[lo:hi] if word['end'] >= start_time]
+
+    def _vote_start(self, script_tokens: List[str], cursor: int) -> Optional[int]:
+        """Guess where script_tokens start at or after cursor by voting with its rarest tokens."""
+        anchors = sorted(
+            {(self.frequency[token], offset, token) for offset, token in enumerate(script_tokens) if token in self.positions}
+        )[:ANCHOR_COUNT]
+        votes = Counter()
+        for _, offset, token in anchors:
+            positions = self.positions[token]
+            for position in positions[bisect_left(positions, cursor):]:
+                votes[max(position - offset, cursor)] += 1
+        if not votes:
+            return None
+        # Most votes wins; ties go to the earliest candidate since beats run in order
+        return min(votes, key=lambda candidate: (-votes[candidate], candidate))
+
+    def align(self, script: str, cursor: int = 0) -> Optional[Dict]:
+        """
+        Find the contiguous word span matching script at or after cursor.
+        Returns start/end times, word indices and the share of script tokens matched, or None.
+        """
+        script_tokens = tokenize(script)
+        if not script_tokens:
+            return None
+        candidate = self._vote_start(script_tokens, cursor)
+        if candidate is None:
+            return None
+        window_start = max(cursor, candidate - WINDOW_PADDING)
+        window_end = min(len(self.tokens), candidate + len(script_tokens) + WINDOW_PADDING)
+        matcher = SequenceMatcher(None, self.tokens[window_start:window_end], script_tokens, autojunk=False)
+        blocks = trim_stray_blocks([block for block in matcher.get_matching_blocks() if block.size])
+        matched = sum(block.size for block in blocks)
+        if not blocks or matched / len(script_tokens) < MIN_MATCH_RATIO:
+            return None
+        first = window_start + blocks[0].a
+        last = window_start + blocks[-1].a + blocks[-1].size - 1
+        return {
+            'start': self.words[first]['start'],
+            'end': self.words[last]['end'],
+            'startIndex': first,
+            'endIndex': last,
+            'score': matched / len(script_tokens),
+        }
+
+def align_beats(word_timings: List[Dict], beats: List[Dict], index: Optional[WordIndex] = None) -> List[Optional[Dict]]:
+    """
+    Align every beat's script to the transcript in one pass.
+    Beats are matched in order, each search starting after the previous beat's span.
+    """
+    index = index or WordIndex(word_timings)
+    cursor = 0
+    alignments = []
+    for beat in beats:
+        alignment = index.align(beat.get('script', ''), cursor)
+        if alignment:
+            cursor = alignment['endIndex'] + 1
+        alignments.append(alignment)
+    return alignments
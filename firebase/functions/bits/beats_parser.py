@@ -0,0 +1,204 @@
+import re
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_TITLE = 'Untitled Comedy Bit'
+DEFAULT_DESCRIPTION = 'A hilarious comedy bit'
+BEAT_FIELDS = ('type', 'description', 'script', 'durationSeconds')
+
+# Structured-output schema for get_gpt_beats (OpenAI json_schema response format)
+BEATS_RESPONSE_FORMAT = {
+    'type': 'json_schema',
+    'json_schema': {
+        'name': 'comedy_beats',
+        'strict': True,
+        'schema': {
+            'type': 'object',
+            'properties': {
+                'title': {'type': 'string'},
+                'description': {'type': 'string'},
+                'beats': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'type': {'type': 'string', 'enum': ['setup', 'punchline']},
+                            'description': {'type': 'string'},
+                            'script': {'type': 'string'},
+                            'durationSeconds': {'type': 'number'},
+                        },
+                        'required': list(BEAT_FIELDS),
+                        'additionalProperties': False,
+                    },
+                },
+            },
+            'required': ['title', 'description', 'beats'],
+            'additionalProperties': False,
+        },
+    },
+}
+
+_FENCE = re.compile(r'```(?:json)?', re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+# How responses were parsed, for failure-rate reporting
+PARSE_STATS = {'strict': 0, 'repaired': 0, 'failed': 0}
+_stats_lock = threading.Lock()
+
+def _count(outcome: str) -> None:
+    with _stats_lock:
+        PARSE_STATS[outcome] += 1
+
+class BeatsStreamParser:
+    """
+    Incremental scanner over a JSON beats response.
+    Beat objects are yielded from feed() as soon as each one closes, before the rest arrives.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.last_key = None
+        self.string_start = None
+        self.in_beats = False
+        self.beat_start = None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        completed = []
+        for char in chunk:
+            self.buffer.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_key = ''.join(self.buffer[self.string_start + 1:-1])
+            elif char == '"':
+                self.in_string = True
+                self.string_start = len(self.buffer) - 1
+            elif char in '{[':
+                self.depth += 1
+                if char == '[' and self.depth == 2 and self.last_key == 'beats':
+                    self.in_beats = True
+                elif char == '{' and self.depth == 3 and self.in_beats:
+                    self.beat_start = len(self.buffer) - 1
+            elif char in '}]':
+                if char == '}' and self.depth == 3 and self.beat_start is not None:
+                    beat = _loads_lenient(''.join(self.buffer[self.beat_start:]))
+                    if isinstance(beat, dict):
+                        completed.append(beat)
+                    self.beat_start = None
+                elif char == ']' and self.depth == 2:
+                    self.in_beats = False
+                self.depth -= 1
+        return completed
+
+    def text(self) -> str:
+        return ''.join(self.buffer)
+
+def _loads_lenient(text: str):
+    try:
+        return json.loads(text)
+    except ValueError:
+        try:
+            return json.loads(_TRAILING_COMMA.sub(r'\1', text))
+        except ValueError:
+            return None
+
+def strip_fences(text: str) -> str:
+    """Drop markdown code fences and any prose before the first '{'."""
+    text = _FENCE.sub('', text)
+    start = text.find('{')
+    return text[start:] if start >= 0 else text
+
+def close_truncated(text: str) -> str:
+    """Close an unterminated string and any open brackets of a cut-off JSON document."""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]' and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(',')
+    # A dangling key ("script": ) cannot be completed, so drop it
+    text = re.sub(r',?\s*"[^"]*"\s*:\s*$', '', text)
+    return _TRAILING_COMMA.sub(r'\1', text + ''.join(reversed(stack)))
+
+def _extract_string_field(text: str, field: str) -> Optional[str]:
+    match = re.search(rf'"{field}"\s*:\s*"((?:[^"\\]|\\.)*)"', text)
+    return json.loads(f'"{match.group(1)}"') if match else None
+
+def _repair_beat(beat: Dict) -> Optional[Dict]:
+    """Keep a beat if it has a type and script; fill the optional fields."""
+    if not isinstance(beat, dict) or not beat.get('type') or not beat.get('script'):
+        return None
+    repaired = dict(beat)
+    repaired.setdefault('description', '')
+    try:
+        repaired['durationSeconds'] = float(repaired.get('durationSeconds', 0))
+    except (TypeError, ValueError):
+        repaired['durationSeconds'] = 0
+    return repaired
+
+def parse_beats_response(text: str, record: bool = True) -> Tuple[Dict, str]:
+    """
+    Parse a beats response into {'title', 'description', 'beats'} without another LLM call.
+    Fenced, prose-wrapped, trailing-comma and truncated output is repaired in place;
+    beats that can be recovered are kept individually.
+    Returns (result, outcome) where outcome is 'strict', 'repaired' or 'failed'.
+    """
+    data = None
+    outcome = 'strict'
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        outcome = 'repaired'
+        candidate = strip_fences(text or '')
+        # Trailing prose after the object, then a cut-off object
+        data = (_loads_lenient(candidate)
+                or _loads_lenient(candidate[:candidate.rfind('}') + 1])
+                or _loads_lenient(close_truncated(candidate)))
+
+    if isinstance(data, dict):
+        beats = data.get('beats') or []
+        title = data.get('title')
+        description = data.get('description')
+    else:
+        # Fall back to pulling fields and complete beat objects out of the raw text
+        parser = BeatsStreamParser()
+        beats = parser.feed(strip_fences(text or ''))
+        title = _extract_string_field(text or '', 'title')
+        description = _extract_string_field(text or '', 'description')
+
+    repaired_beats = [beat for beat in (_repair_beat(b) for b in beats) if beat]
+    if len(repaired_beats) != len(beats):
+        outcome = 'repaired'
+    result = {
+        'title': title or DEFAULT_TITLE,
+        'description': description or DEFAULT_DESCRIPTION,
+        'beats': repaired_beats,
+    }
+    if len(repaired_beats) != 2:
+        outcome = 'failed'
+    if record:
+        _count(outcome)
+    return result, outcome
@@ -0,0 +1,42 @@
+import os
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Default Cloud Storage bucket for uploads and HLS output
+DEFAULT_BUCKET = 'jocus-6c88f.firebasestorage.app'
+
+# Process-wide clients, created on first use and reused by every invocation on the instance.
+# SDKs are imported here rather than at module load so a handler only pays for the ones it uses.
+_openai_client = None
+_firestore_client = None
+_buckets = {}
+_lock = threading.Lock()
+
+def get_openai_client() -> 'OpenAI':
+    """Return the shared OpenAI client (its HTTP connection pool survives across invocations)."""
+    global _openai_client
+    with _lock:
+        if _openai_client is None:
+            from openai import OpenAI
+            _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return _openai_client
+
+def get_firestore_client():
+    """Return the shared Firestore client."""
+    global _firestore_client
+    with _lock:
+        if _firestore_client is None:
+            from firebase_admin import firestore
+            _firestore_client = firestore.client()
+        return _firestore_client
+
+def get_bucket(name: str = DEFAULT_BUCKET):
+    """Return the shared Cloud Storage bucket handle for name."""
+    with _lock:
+        if name not in _buckets:
+            from firebase_admin import storage
+            _buckets[name] = storage.bucket(name)
+        return _buckets[name]
@@ -1,46 +1,46 @@
 from firebase_functions import https_fn
-from firebase_admin import firestore
 from datetime import datetime
-from typing import Dict, List, Optional
-from openai import OpenAI
-import os
-import json
+from typing import TYPE_CHECKING, Dict, List, Optional
+import time
+import logging
+from .beat_alignment import WordIndex, align_beats
+from .beats_parser import BEATS_RESPONSE_FORMAT, PARSE_STATS, parse_beats_response
+from .clients import get_firestore_client, get_openai_client
+from .llm_cache import cached_chat_completion
+from .tracing import span
 
-def get_words_between(word_timings: List[Dict], start_time: float, end_time: float) -> str:
+# Configure logging
+logger = logging.getLogger('comedy_structure')
+logger.setLevel(logging.INFO)
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+def get_words_between(word_timings: List[Dict], start_time: float, end_time: float,
+                      index: Optional[WordIndex] = None) -> str:
     """Get the words that occur between start_time and end_time."""
-    words = []
-    for word in word_timings:
-        # Include word if it overlaps with the time range at all
-        if (word['start'] <= end_time and word['end'] >= start_time):
-            words.append(word['word'])
-    return ' '.join(words)
+    # Include word if it overlaps with the time range at all
+    index = index or WordIndex(word_timings)
+    return ' '.join(word['word'] for word in index.words_between(start_time, end_time))
 
-def find_word_boundaries(word_timings: List[Dict], words: List[str]) -> Dict[str, float]:
+def find_word_boundaries(word_timings: List[Dict], words: List[str],
+                         index: Optional[WordIndex] = None) -> Dict[str, float]:
     """Find the start time of the first word and end time of the last word in a script."""
-    # Convert words to lowercase for matching
-    target_words = [w.lower() for w in words]
-    
-    # Find the first and last word indices 
-    first_word_time = None
-    last_word_time = None
-    
-    # Create a sliding window of words from the timing data
-    for i in range(len(word_timings)):
-        current_word = word_timings[i]['word'].lower()
-        if current_word == target_words[0] and first_word_time is None:
-            first_word_time = word_timings[i]['start']
-        if current_word == target_words[-1]:
-            last_word_time = word_timings[i]['end']
-            
-    if first_word_time is None or last_word_time is None:
-        # Fallback if exact match fails
+    index = index or WordIndex(word_timings)
+    alignment = index.align(' '.join(words))
+    if alignment is None:
+        # Fallback if the script cannot be matched
         return {'start': word_timings[0]['start'], 'end': word_timings[-1]['end']}
         
-    return {'start': first_word_time, 'end': last_word_time}
+    return {'start': alignment['start'], 'end': alignment['end']}
 
-def get_gpt_beats(transcript: str, word_timings: List[Dict]) -> Dict:
+def is_valid_beats_response(content: str) -> bool:
+    """Only answers that parse into two beats without repair are worth caching."""
+    return parse_beats_response(content, record=False)[1] == 'strict'
+
+def get_gpt_beats(transcript: str, word_timings: List[Dict], client: Optional['OpenAI'] = None) -> Dict:
     """Use GPT-4o-mini to analyze transcript and identify comedy beats, generate a title and description."""
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = client or get_openai_client()
     
     prompt = f"""Analyze this comedy transcript and identify the setup and punchline, generate a short catchy title and brief description.
 
@@ -75,38 +75,45 @@ def get_gpt_beats(transcript: str, word_timings: List[Dict]) -> Dict:
     
     Transcript: {transcript}"""
     
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7
-    )
+    start = time.perf_counter()
+    with span('gpt', model="gpt-4o-mini"):
+        content = cached_chat_completion(
+            client,
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            validate=is_valid_beats_response,
+            response_format=BEATS_RESPONSE_FORMAT,
+            temperature=0.7
+        )
+    latency = time.perf_counter() - start
     
-    try:
-        gpt_response = json.loads(response.choices[0].message.content)
-        beats = gpt_response['beats']
-        title = gpt_response.get('title', 'Untitled Comedy Bit')
-        description = gpt_response.get('description', 'A hilarious comedy bit')
-        if len(beats) != 2:
-            print("Error: GPT did not return exactly 2 beats")
-            return {'title': title, 'description': description, 'beats': []}
-        return {'title': title, 'description': description, 'beats': beats}
-    except Exception as e:
-        print(f"Error parsing GPT response: {str(e)}")
-        return {'title': 'Untitled Comedy Bit', 'description': 'A hilarious comedy bit', 'beats': []}
+    # Repair fenced or cut-off output locally rather than paying for another round trip
+    result, outcome = parse_beats_response(content)
+    logger.info(f"Beats response {outcome} in {latency:.2f}s (parse outcomes so far: {PARSE_STATS})")
+    if outcome == 'failed':
+        logger.error(f"GPT did not return exactly 2 usable beats ({len(result['beats'])} recovered)")
+        result['beats'] = []
+    return result
 
-@https_fn.on_call()
-def analyze_joke_transcript(req: https_fn.CallableRequest) -> Dict:
-    """Analyze transcript to create a comedy structure."""
-    data = req.data
-    transcript = data.get('transcript', '')
-    word_timings = data.get('wordTimings', [])
-    user_id = data.get('userId', '')
-    
+def create_comedy_structure(transcript: str, word_timings: List[Dict], user_id: str,
+                            client: Optional['OpenAI'] = None, db=None) -> Dict:
+    """
+    Pipeline stage: analyze a transcript and save the resulting comedy structure for the user.
+    Called in-process after transcription and wrapped by the analyze_joke_transcript endpoint.
+    """
     if not transcript or not word_timings or not user_id:
         raise ValueError("Missing required data")
     
     # Get beats, title and description from GPT
-    gpt_response = get_gpt_beats(transcript, word_timings)
+    gpt_response = get_gpt_beats(transcript, word_timings, client)
+    
+    # Attach the time span each beat covers in the recording
+    with span('align'):
+        alignments = align_beats(word_timings, gpt_response['beats'])
+    for beat, alignment in zip(gpt_response['beats'], alignments):
+        if alignment:
+            beat['startTime'] = alignment['start']
+            beat['endTime'] = alignment['end']
     
     # Create comedy structure
     structure = {
@@ -123,9 +130,10 @@ def analyze_joke_transcript(req: https_fn.CallableRequest) -> Dict:
     }
     
     # Save to Firestore
-    db = firestore.client()
+    db = db or get_firestore_client()
     doc_ref = db.collection('users').document(user_id).collection('comedy_structures').document()
-    doc_ref.set(structure)
+    with span('save'):
+        doc_ref.set(structure)
     
     # Return both the ID and the complete structure with scripts
     return {
@@ -133,3 +141,12 @@ def analyze_joke_transcript(req: https_fn.CallableRequest) -> Dict:
         'structure': structure,
         'timeline': gpt_response['beats']  # Include timeline separately for immediate access
     }
+
+def analyze_joke_transcript(req: https_fn.CallableRequest) -> Dict:
+    """Analyze transcript to create a comedy structure."""
+    data = req.data
+    return create_comedy_structure(
+        data.get('transcript', ''),
+        data.get('wordTimings', []),
+        data.get('userId', '')
+    )
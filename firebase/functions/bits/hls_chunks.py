@@ -0,0 +1,57 @@
+import math
+from typing import List, Tuple
+
+# Chunks shorter than this are merged into their neighbour; tiny chunks waste encoder startup
+MIN_CHUNK_SECONDS = 8.0
+TARGET_CHUNK_SECONDS = 20.0
+
+def plan_chunks(keyframes: List[float], duration: float,
+                target_seconds: float = TARGET_CHUNK_SECONDS) -> List[Tuple[float, float]]:
+    """
+    Split [0, duration) into (start, end) chunks that begin on keyframes.
+    Each chunk is about target_seconds long; a short tail is folded into the previous chunk.
+    """
+    boundaries = [0.0]
+    for keyframe in sorted(keyframes):
+        if keyframe - boundaries[-1] >= target_seconds and duration - keyframe >= MIN_CHUNK_SECONDS:
+            boundaries.append(keyframe)
+    boundaries.append(duration)
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
+
+def parse_media_playlist(content: str) -> List[Tuple[float, str]]:
+    """Return the (duration, uri) segments listed in an HLS media playlist."""
+    segments = []
+    duration = None
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith('#EXTINF:'):
+            duration = float(line[len('#EXTINF:'):].split(',', 1)[0])
+        elif line and not line.startswith('#') and duration is not None:
+            segments.append((duration, line))
+            duration = None
+    return segments
+
+def stitch_media_playlists(chunks: List[List[Tuple[float, str]]], media_sequence: int = 0) -> str:
+    """
+    Join per-chunk segment lists into one VOD media playlist.
+    Chunks were encoded independently, so each boundary is marked with EXT-X-DISCONTINUITY
+    to make players reset their decoders.
+    """
+    durations = [duration for chunk in chunks for duration, _ in chunk]
+    target_duration = math.ceil(max(durations)) if durations else 0
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        f'#EXT-X-TARGETDURATION:{target_duration}',
+        f'#EXT-X-MEDIA-SEQUENCE:{media_sequence}',
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+        '#EXT-X-INDEPENDENT-SEGMENTS',
+    ]
+    for index, chunk in enumerate(chunks):
+        if index > 0 and chunk:
+            lines.append('#EXT-X-DISCONTINUITY')
+        for duration, uri in chunk:
+            lines.append(f'#EXTINF:{duration:.6f},')
+            lines.append(uri)
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,118 @@
+from enum import Enum
+from typing import Dict, List, Optional
+
+# Define quality levels (name, width, height, bitrate)
+QUALITIES = [
+    ('240p', 426, 240, '400k'),
+    ('480p', 854, 480, '800k'),
+    ('720p', 1280, 720, '1800k'),
+]
+
+AUDIO_BITRATE = 128000
+# A source this much above a rung's target bitrate is re-encoded rather than copied
+BITRATE_TOLERANCE = 1.25
+COPY_VIDEO_CODECS = {'h264'}
+COPY_AUDIO_CODECS = {'aac'}
+
+class RenditionMode(str, Enum):
+    encode = 'encode'
+    copy = 'copy'
+
+def parse_bitrate(value) -> Optional[int]:
+    """Parse '800k' / '1800000' style bitrates into bits per second."""
+    if value is None:
+        return None
+    value = str(value)
+    if value.endswith('k'):
+        return int(float(value[:-1]) * 1000)
+    if value.endswith('M'):
+        return int(float(value[:-1]) * 1000000)
+    return int(value) if value.isdigit() else None
+
+def summarize_probe(probe: Dict) -> Dict:
+    """Reduce ffprobe JSON to the fields the ladder decision needs."""
+    streams = probe.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    format_bitrate = parse_bitrate(probe.get('format', {}).get('bit_rate'))
+    summary = {'video': None, 'audio': None}
+    if video:
+        video_bitrate = parse_bitrate(video.get('bit_rate'))
+        if video_bitrate is None and format_bitrate is not None:
+            # Containers like MKV/WebM only report an overall bitrate
+            video_bitrate = max(format_bitrate - AUDIO_BITRATE, 0) if audio else format_bitrate
+        summary['video'] = {
+            'codec': video.get('codec_name'),
+            'width': int(video.get('width', 0)),
+            'height': int(video.get('height', 0)),
+            'bitrate': video_bitrate,
+        }
+    if audio:
+        summary['audio'] = {
+            'codec': audio.get('codec_name'),
+            'channels': int(audio.get('channels', 0)),
+            'sampleRate': int(audio.get('sample_rate', 0)),
+            'bitrate': parse_bitrate(audio.get('bit_rate')),
+        }
+    return summary
+
+def make_rung(quality: tuple, video_mode: RenditionMode = RenditionMode.encode,
+              audio_mode: RenditionMode = RenditionMode.encode, bandwidth: Optional[int] = None) -> Dict:
+    """Describe one rendition; bandwidth is what the master playlist advertises."""
+    name, width, height, bitrate = quality
+    return {
+        'name': name,
+        'width': width,
+        'height': height,
+        'bitrate': bitrate,
+        'video': video_mode.value,
+        'audio': audio_mode.value,
+        'bandwidth': bandwidth or parse_bitrate(bitrate) + AUDIO_BITRATE,
+    }
+
+def default_ladder(qualities: List[tuple] = QUALITIES) -> List[Dict]:
+    """Every quality re-encoded, regardless of the source."""
+    return [make_rung(quality) for quality in qualities]
+
+def can_copy_audio(audio: Optional[Dict]) -> bool:
+    if not audio or audio['codec'] not in COPY_AUDIO_CODECS or audio['channels'] > 2:
+        return False
+    return audio['bitrate'] is None or audio['bitrate'] <= AUDIO_BITRATE * BITRATE_TOLERANCE
+
+def orient_quality(quality: tuple, video: Dict) -> tuple:
+    """The quality with width and height swapped for a portrait source, so rungs keep its orientation."""
+    name, width, height, bitrate = quality
+    return (name, height, width, bitrate) if video['height'] > video['width'] else quality
+
+def can_copy_video(video: Dict, quality: tuple) -> bool:
+    """quality must already be oriented like the source (see orient_quality)."""
+    _, width, height, bitrate = quality
+    if video['codec'] not in COPY_VIDEO_CODECS or (video['width'], video['height']) != (width, height):
+        return False
+    return video['bitrate'] is not None and video['bitrate'] <= parse_bitrate(bitrate) * BITRATE_TOLERANCE
+
+def plan_ladder(source: Dict, qualities: List[tuple] = QUALITIES) -> List[Dict]:
+    """
+    Decide which renditions to produce for a probed source (see summarize_probe).
+    Rungs above the source resolution are dropped (the lowest rung is always kept),
+    rungs of a portrait source are portrait too, and a rung whose codec, size
+    and bitrate already match the source is stream-copied.
+    """
+    video = source.get('video')
+    if not video:
+        raise ValueError("Source has no video stream")
+    audio_mode = RenditionMode.copy if can_copy_audio(source.get('audio')) else RenditionMode.encode
+    audio_bitrate = (source.get('audio') or {}).get('bitrate') or AUDIO_BITRATE
+
+    # Compare against the short side so portrait phone video keeps its rungs
+    source_size = min(video['width'], video['height'])
+    ladder = []
+    for index, quality in enumerate(qualities):
+        if index > 0 and quality[2] > source_size:
+            continue
+        quality = orient_quality(quality, video)
+        if can_copy_video(video, quality):
+            ladder.append(make_rung(quality, RenditionMode.copy, audio_mode, video['bitrate'] + audio_bitrate))
+        else:
+            ladder.append(make_rung(quality, RenditionMode.encode, audio_mode))
+    return ladder
@@ -1,15 +1,24 @@
 import os
 import logging
-import tempfile
+import subprocess
 import ffmpeg
-import requests
 from urllib.parse import urlparse
-from firebase_admin import storage
 from firebase_admin import firestore
 from firebase_functions import firestore_fn
 from enum import Enum
 import time
-from firebase_functions import options
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from .clients import get_bucket, get_firestore_client
+from .leases import claim_lease
+from .source_fetch import fetched_source
+from .workspace import job_workspace
+from .hls_ladder import RenditionMode, plan_ladder, summarize_probe
+from .hls_chunks import parse_media_playlist, plan_chunks, stitch_media_playlists
+from .hls_uploader import GcsBlobStore, upload_hls_directory
+from .videos import find_video_doc
+from .thumbnails import plan_thumbnails, thumbnail_outputs, thumbnail_urls, write_thumbnails_vtt
+from .tracing import Trace, communicate_with_usage, record, span, wrap_context
 
 # Configure logging
 logger = logging.getLogger('hls_transcoder')
@@ -17,202 +26,349 @@ logger.setLevel(logging.INFO)
 
 class VideoStatus(str, Enum):
     processing = 'processing'
+    partial = 'partial'
     ready = 'ready'
     error = 'error'
 
-def create_hls_stream(video_url: str, video_path: str) -> str:
+# Encoder settings shared by every re-encoded rendition
+AUDIO_OUTPUT_ARGS = {
+    'c:a': 'aac',  # Explicitly set audio codec
+    'b:a': '128k',  # Audio bitrate
+    'ac': 2,  # 2 audio channels (stereo)
+    'ar': '44100',  # audio sample rate
+    'strict': 'experimental',  # Allow experimental codecs
+    'channel_layout': 'stereo',  # Force stereo layout
+}
+
+AUDIO_COPY_ARGS = {
+    'c:a': 'copy',
+}
+
+HLS_OUTPUT_ARGS = {
+    'hls_time': 4,
+    'hls_list_size': 0,
+    'hls_flags': 'independent_segments+program_date_time',  # Added program_date_time for better player compatibility
+    'start_number': 0,
+    'hls_segment_type': 'mpegts',
+    'f': 'hls',
+}
+
+# HLS output for the whole ladder is budgeted at this multiple of the source size
+HLS_WORKSPACE_FACTOR = 2
+
+# Concurrent chunk encodes for segment-parallel mode; 0 or 1 disables it
+PARALLEL_WORKERS = int(os.getenv('HLS_PARALLEL_WORKERS', '0'))
+
+def verify_output_audio(output_path: str) -> None:
+    """Raise if a transcoded playlist has no audio stream."""
+    output_probe = ffmpeg.probe(output_path)
+    output_audio = [stream for stream in output_probe['streams'] if stream['codec_type'] == 'audio']
+    if output_audio:
+        logger.info(f"Output stream has {len(output_audio)} audio streams")
+        for stream in output_audio:
+            logger.info(f"Output audio: codec={stream.get('codec_name')}, channels={stream.get('channels')}, sample_rate={stream.get('sample_rate')}")
+    else:
+        logger.error("No audio streams found in output file!")
+        raise Exception("Transcoding failed: No audio streams in output file")
+
+def run_ffmpeg(stream) -> None:
+    """
+    Run an ffmpeg-python graph, logging stderr and re-raising ffmpeg errors.
+    The process's CPU time is recorded on the current trace span.
+    """
+    logger.info("Starting FFmpeg transcoding...")
+    process = subprocess.Popen(ffmpeg.compile(stream, overwrite_output=True),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err, returncode, cpu_seconds = communicate_with_usage(process)
+    if returncode != 0:
+        logger.error(f"FFmpeg error during transcoding: {err.decode(errors='ignore')}")
+        raise ffmpeg.Error('ffmpeg', out, err)
+    if err:
+        logger.info(f"FFmpeg stderr output: {err.decode()}")
+    logger.info(f"FFmpeg used {cpu_seconds:.2f}s of CPU")
+
+def log_source_streams(probe: Dict) -> None:
+    """Log the audio streams found by the job's single probe."""
+    audio_streams = [stream for stream in probe['streams'] if stream['codec_type'] == 'audio']
+    logger.info(f"Found {len(audio_streams)} audio streams in input file")
+    for stream in audio_streams:
+        logger.info(f"Audio stream: codec={stream.get('codec_name')}, channels={stream.get('channels')}, sample_rate={stream.get('sample_rate')}")
+
+def get_audio_args(rungs: List[Dict]) -> Dict:
+    """Audio is copied only when the ladder decided the source track is already usable."""
+    return AUDIO_COPY_ARGS if rungs[0]['audio'] == RenditionMode.copy else AUDIO_OUTPUT_ARGS
+
+def transcode_per_quality(input_path: str, hls_dir: str, rungs: List[Dict],
+                          thumbnails: Optional[Dict] = None) -> None:
+    """
+    Encode each rendition with its own ffmpeg run (decodes the source once per rendition).
+    The thumbnail outputs, if planned, ride along with the first rendition's run.
+    """
+    for index, rung in enumerate(rungs):
+        quality = rung['name']
+        quality_dir = os.path.join(hls_dir, quality)
+        os.makedirs(quality_dir, exist_ok=True)
+        output_path = os.path.join(quality_dir, 'stream.m3u8')
+        
+        logger.info(f"Transcoding {quality} stream (video {rung['video']}, audio {rung['audio']})...")
+        
+        # Create input streams
+        input_stream = ffmpeg.input(input_path)
+        
+        # Separate video and audio streams, scaling the video unless it is copied
+        if rung['video'] == RenditionMode.copy:
+            video_stream = input_stream.video
+            video_args = {'c:v': 'copy'}
+        else:
+            video_stream = ffmpeg.filter(input_stream.video, 'scale', rung['width'], rung['height'])
+            video_args = {'c:v': 'libx264', 'b:v': rung['bitrate']}
+        audio_stream = input_stream.audio
+        
+        # Output with explicit stream mapping
+        stream = ffmpeg.output(
+            video_stream,
+            audio_stream,
+            output_path,
+            hls_segment_filename=os.path.join(quality_dir, 'segment_%03d.ts'),
+            **video_args,
+            **get_audio_args([rung]),
+            **HLS_OUTPUT_ARGS
+        )
+        if thumbnails and index == 0:
+            stream = ffmpeg.merge_outputs(stream, *thumbnail_outputs(input_stream.video, thumbnails))
+        
+        run_ffmpeg(stream)
+        logger.info(f"Finished transcoding {quality} stream")
+        verify_output_audio(output_path)
+
+def transcode_single_pass(input_path: str, hls_dir: str, rungs: List[Dict],
+                          thumbnails: Optional[Dict] = None) -> None:
+    """
+    Encode every rendition in one ffmpeg run.
+    The source is decoded once and split into one video/audio pair per re-encoded rendition,
+    copied renditions map the source streams directly;
+    the HLS muxer writes each variant playlist via var_stream_map.
+    Planned poster and sprite outputs are added to the same graph.
+    """
+    logger.info(f"Transcoding {', '.join(rung['name'] for rung in rungs)} in a single pass...")
+    
+    for rung in rungs:
+        os.makedirs(os.path.join(hls_dir, rung['name']), exist_ok=True)
+    
+    input_stream = ffmpeg.input(input_path)
+    encoded_count = sum(1 for rung in rungs if rung['video'] == RenditionMode.encode)
+    video_split = input_stream.video.filter_multi_output('split', encoded_count) if encoded_count else None
+    copy_audio = rungs[0]['audio'] == RenditionMode.copy
+    audio_split = None if copy_audio else input_stream.audio.filter_multi_output('asplit', len(rungs))
+    
+    streams = []
+    codec_args = {}
+    stream_map = []
+    split_index = 0
+    for index, rung in enumerate(rungs):
+        if rung['video'] == RenditionMode.copy:
+            streams.append(input_stream.video)
+            codec_args[f'c:v:{index}'] = 'copy'
+        else:
+            streams.append(video_split[split_index].filter('scale', rung['width'], rung['height']))
+            split_index += 1
+            codec_args[f'c:v:{index}'] = 'libx264'
+            codec_args[f'b:v:{index}'] = rung['bitrate']
+        streams.append(input_stream.audio if copy_audio else audio_split[index])
+        stream_map.append(f"v:{index},a:{index},name:{rung['name']}")
+    
+    stream = ffmpeg.output(
+        *streams,
+        os.path.join(hls_dir, '%v', 'stream.m3u8'),
+        var_stream_map=' '.join(stream_map),
+        hls_segment_filename=os.path.join(hls_dir, '%v', 'segment_%03d.ts'),
+        **codec_args,
+        **get_audio_args(rungs),
+        **HLS_OUTPUT_ARGS
+    )
+    if thumbnails:
+        stream = ffmpeg.merge_outputs(stream, *thumbnail_outputs(input_stream.video, thumbnails))
+    
+    run_ffmpeg(stream)
+    logger.info("Finished single-pass transcoding")
+    for rung in rungs:
+        verify_output_audio(os.path.join(hls_dir, rung['name'], 'stream.m3u8'))
+
+def probe_keyframes(input_path: str) -> Tuple[List[float], float]:
+    """Return the video keyframe timestamps and the duration of the source."""
+    probe = ffmpeg.probe(input_path, select_streams='v:0', skip_frame='nokey', show_entries='frame=pts_time')
+    keyframes = [float(frame['pts_time']) for frame in probe.get('frames', []) if 'pts_time' in frame]
+    return keyframes, float(probe['format']['duration'])
+
+def encode_chunk(input_path: str, rung_dir: str, rung: Dict, index: int,
+                 start: float, end: float, threads: int) -> List[Tuple[float, str]]:
+    """Encode one keyframe-aligned chunk of one rendition and return its (duration, uri) segments."""
+    prefix = f'c{index:03d}'
+    chunk_playlist = os.path.join(rung_dir, f'{prefix}.m3u8')
+    
+    # Seek on the input so only this chunk is decoded; keyframe starts keep copies clean
+    input_stream = ffmpeg.input(input_path, ss=start, t=end - start)
+    if rung['video'] == RenditionMode.copy:
+        video_stream = input_stream.video
+        video_args = {'c:v': 'copy'}
+    else:
+        video_stream = ffmpeg.filter(input_stream.video, 'scale', rung['width'], rung['height'])
+        video_args = {'c:v': 'libx264', 'b:v': rung['bitrate'], 'threads': threads}
+    
+    stream = ffmpeg.output(
+        video_stream,
+        input_stream.audio,
+        chunk_playlist,
+        hls_segment_filename=os.path.join(rung_dir, f'{prefix}_%03d.ts'),
+        output_ts_offset=start,  # keep timestamps continuous across chunks
+        **video_args,
+        **get_audio_args([rung]),
+        **{**HLS_OUTPUT_ARGS, 'hls_flags': 'independent_segments'}
+    )
+    run_ffmpeg(stream)
+    
+    with open(chunk_playlist) as f:
+        segments = parse_media_playlist(f.read())
+    os.remove(chunk_playlist)
+    return segments
+
+def render_thumbnails(input_path: str, thumbnails: Dict) -> None:
+    """Produce the poster and sprite sheets in their own ffmpeg run."""
+    run_ffmpeg(ffmpeg.merge_outputs(*thumbnail_outputs(ffmpeg.input(input_path).video, thumbnails)))
+
+def transcode_segment_parallel(input_path: str, hls_dir: str, rungs: List[Dict], workers: int,
+                               thumbnails: Optional[Dict] = None) -> None:
+    """
+    Cut the source at keyframes into GOP-aligned chunks and encode every (chunk, rendition)
+    pair as its own ffmpeg process, at most `workers` at a time.
+    The chunk segment lists are then stitched into one continuous playlist per rendition.
+    No process sees the whole source here, so thumbnails are one more job on the same pool.
+    """
+    keyframes, duration = probe_keyframes(input_path)
+    chunks = plan_chunks(keyframes, duration)
+    logger.info(f"Transcoding {', '.join(rung['name'] for rung in rungs)} as {len(chunks)} chunks on {workers} workers...")
+    
+    for rung in rungs:
+        os.makedirs(os.path.join(hls_dir, rung['name']), exist_ok=True)
+    
+    # Split the cores between concurrent encoders instead of oversubscribing them
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            (rung['name'], index): executor.submit(
+                wrap_context(encode_chunk), input_path, os.path.join(hls_dir, rung['name']), rung, index, start, end, threads
+            )
+            for rung in rungs
+            for index, (start, end) in enumerate(chunks)
+        }
+        if thumbnails:
+            futures['thumbnails'] = executor.submit(wrap_context(render_thumbnails), input_path, thumbnails)
+        results = {key: future.result() for key, future in futures.items()}
+    
+    for rung in rungs:
+        playlist_path = os.path.join(hls_dir, rung['name'], 'stream.m3u8')
+        with open(playlist_path, 'w') as f:
+            f.write(stitch_media_playlists([results[(rung['name'], index)] for index in range(len(chunks))]))
+        verify_output_audio(playlist_path)
+    logger.info("Finished segment-parallel transcoding")
+
+def write_master_playlist(hls_dir: str, rungs: List[Dict]) -> str:
+    """Write master.m3u8 referencing each rendition's variant playlist."""
+    master_path = os.path.join(hls_dir, 'master.m3u8')
+    with open(master_path, 'w') as f:
+        f.write('#EXTM3U\n')
+        f.write('#EXT-X-VERSION:3\n')
+        for rung in rungs:
+            f.write(f"#EXT-X-STREAM-INF:BANDWIDTH={rung['bandwidth']},RESOLUTION={rung['width']}x{rung['height']}\n")
+            f.write(f"{rung['name']}/stream.m3u8\n")
+    return master_path
+
+def get_publish_steps(rungs: List[Dict], single_pass: bool) -> List[List[Dict]]:
+    """
+    Group renditions into encode/publish steps, lowest rung first so it is playable early.
+    In single-pass mode the higher rungs share one encode, otherwise each rung is its own step.
+    """
+    if single_pass:
+        return [rungs[:1], rungs[1:]] if len(rungs) > 1 else [rungs]
+    return [[rung] for rung in rungs]
+
+def create_hls_stream(video_url: str, video_path: str, single_pass: bool = True,
+                      on_publish: Optional[Callable[[str, List[str], bool, Dict], None]] = None,
+                      workers: int = PARALLEL_WORKERS, thumbnails: bool = True) -> str:
     """
     Convert a video file to HLS format with multiple quality levels.
+    The lowest rung is encoded and uploaded first with an interim master playlist,
+    then the master is rewritten as each higher rung lands. on_publish is called
+    after every master upload with (master_url, published quality names, is_final, assets);
+    assets holds the poster and thumbnail URLs on the step that uploaded them, else it is empty.
+    The poster and sprite sheets come out of the first step's encode.
+    With workers > 1 each step is encoded as parallel keyframe-aligned chunks,
+    with single_pass the higher rungs are decoded once for all renditions,
+    otherwise each quality is encoded by its own ffmpeg run.
     Returns the base URL for the HLS stream.
     """
     logger.info(f"Starting HLS conversion for video at {video_path}")
     
-    bucket = storage.bucket('jocus-6c88f.firebasestorage.app')
-    # Create temporary directory for processing
-    with tempfile.TemporaryDirectory() as temp_dir:
+    store = GcsBlobStore(get_bucket())
+    # The source and this job's private workspace (sized from it) are both removed when the job ends
+    with fetched_source(video_url, video_path) as input_path, \
+            job_workspace(video_path, os.path.getsize(input_path) * HLS_WORKSPACE_FACTOR) as temp_dir:
+        logger.info(f"Using source video at {input_path}")
         logger.info(f"Created temp dir: {temp_dir}")
         
-        # Download video using requests (matching transcripts.py approach)
-        input_path = os.path.join(temp_dir, 'input.mp4')
-        logger.info(f"Downloading video from {video_url}")
-        response = requests.get(video_url)
-        response.raise_for_status()  # Raise an error for bad status codes
-        
-        with open(input_path, 'wb') as f:
-            f.write(response.content)
-        logger.info(f"Downloaded video to {input_path}")
-        
-        # Create HLS output directory
-        hls_dir = os.path.join(temp_dir, 'hls')
-        os.makedirs(hls_dir, exist_ok=True)
-        
-        # Define quality levels (resolution, bitrate)
-        qualities = [
-            ('240p', 426, 240, '400k'),
-            ('480p', 854, 480, '800k'),
-            ('720p', 1280, 720, '1800k'),
-        ]
+        # Probe once per job; the result decides which renditions to produce and how
+        with span('probe'):
+            probe = ffmpeg.probe(input_path)
+        log_source_streams(probe)
+        summary = summarize_probe(probe)
+        rungs = plan_ladder(summary)
+        duration = float(probe.get('format', {}).get('duration') or 0)
+        for rung in rungs:
+            logger.info(f"Planned {rung['name']}: video {rung['video']}, audio {rung['audio']}")
         
-        # Create variant streams
-        variant_streams = []
-        for quality, width, height, bitrate in qualities:
-            quality_dir = os.path.join(hls_dir, quality)
-            os.makedirs(quality_dir, exist_ok=True)
-            output_path = os.path.join(quality_dir, 'stream.m3u8')
-            variant_streams.append((output_path, width, height, bitrate, quality))
-            
-            logger.info(f"Transcoding {quality} stream...")
+        steps = get_publish_steps(rungs, single_pass)
+        published = []
+        master_url = None
+        for index, step_rungs in enumerate(steps):
+            is_final = index == len(steps) - 1
             
-            # First analyze the input file for audio streams
-            probe = ffmpeg.probe(input_path)
-            audio_streams = [stream for stream in probe['streams'] if stream['codec_type'] == 'audio']
-            logger.info(f"Found {len(audio_streams)} audio streams in input file")
-            for stream in audio_streams:
-                logger.info(f"Audio stream: codec={stream.get('codec_name')}, channels={stream.get('channels')}, sample_rate={stream.get('sample_rate')}")
+            # Each step gets its own output directory so only new files are uploaded
+            hls_dir = os.path.join(temp_dir, f'hls_{index}')
+            os.makedirs(hls_dir, exist_ok=True)
             
-            # Create input streams
-            input_stream = ffmpeg.input(input_path)
+            # Poster and scrub thumbnails come from the first step's decode
+            thumbnail_plan = None
+            if thumbnails and index == 0 and summary['video'] and duration > 0:
+                thumbnail_plan = plan_thumbnails(duration, hls_dir)
             
-            # Separate video and audio streams
-            video_stream = input_stream.video
-            audio_stream = input_stream.audio
+            # Create variant streams
+            step_names = [rung['name'] for rung in step_rungs]
+            with span('encode', renditions=step_names):
+                if workers > 1:
+                    transcode_segment_parallel(input_path, hls_dir, step_rungs, workers, thumbnail_plan)
+                elif single_pass:
+                    transcode_single_pass(input_path, hls_dir, step_rungs, thumbnail_plan)
+                else:
+                    transcode_per_quality(input_path, hls_dir, step_rungs, thumbnail_plan)
+            if thumbnail_plan:
+                write_thumbnails_vtt(thumbnail_plan)
+            published.extend(step_rungs)
             
-            # Apply filters
-            video_stream = ffmpeg.filter(video_stream, 'scale', width, height)
+            # Master playlist lists every rung published so far
+            write_master_playlist(hls_dir, published)
             
-            # Output with explicit stream mapping
-            stream = ffmpeg.output(
-                video_stream,  # Video stream
-                audio_stream,  # Audio stream
-                output_path,
-                acodec='aac',
-                vcodec='libx264',
-                video_bitrate=bitrate,
-                audio_bitrate='128k',
-                ac=2,  # 2 audio channels (stereo)
-                ar='44100',  # audio sample rate
-                **{
-                    'c:a': 'aac',  # Explicitly set audio codec
-                    'b:a': '128k',  # Audio bitrate
-                    'strict': 'experimental',  # Allow experimental codecs
-                    'channel_layout': 'stereo',  # Force stereo layout
-                },
-                hls_time=4,
-                hls_list_size=0,
-                hls_flags='independent_segments+program_date_time',  # Added program_date_time for better player compatibility
-                start_number=0,
-                hls_segment_type='mpegts',
-                hls_segment_filename=os.path.join(quality_dir, 'segment_%03d.ts'),
-                f='hls'
-            )
+            # Upload HLS files to Firebase Storage
+            logger.info(f"Will upload HLS files to path: {video_path}")
+            with span('upload', renditions=step_names):
+                report = upload_hls_directory(store, hls_dir, video_path, final=is_final)
+                record(bytes=report['bytes'], retries=sum(result['attempts'] - 1 for result in report['files']))
+            master_url = report['masterUrl']
+            logger.info(f"Published {', '.join(r['name'] for r in published)} at {master_url}")
             
-            try:
-                # Run FFmpeg with detailed logging
-                logger.info("Starting FFmpeg transcoding...")
-                out, err = ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
-                if err:
-                    logger.info(f"FFmpeg stderr output: {err.decode()}")
-                logger.info(f"Finished transcoding {quality} stream")
-                
-                # Verify the output has audio
-                output_probe = ffmpeg.probe(output_path)
-                output_audio = [stream for stream in output_probe['streams'] if stream['codec_type'] == 'audio']
-                if output_audio:
-                    logger.info(f"Output stream has {len(output_audio)} audio streams")
-                    for stream in output_audio:
-                        logger.info(f"Output audio: codec={stream.get('codec_name')}, channels={stream.get('channels')}, sample_rate={stream.get('sample_rate')}")
-                else:
-                    logger.error("No audio streams found in output file!")
-                    raise Exception("Transcoding failed: No audio streams in output file")
-                    
-            except ffmpeg.Error as e:
-                logger.error(f"FFmpeg error during transcoding: {e.stderr.decode() if e.stderr else str(e)}")
-                raise
-        
-        # Create master playlist
-        master_path = os.path.join(hls_dir, 'master.m3u8')
-        with open(master_path, 'w') as f:
-            f.write('#EXTM3U\n')
-            f.write('#EXT-X-VERSION:3\n')
-            for output_path, width, height, bitrate, quality in variant_streams:
-                bandwidth = int(bitrate.replace('k', '000'))
-                f.write(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={width}x{height}\n')
-                f.write(f'{quality}/stream.m3u8\n')
-        
-        # Upload HLS files to Firebase Storage
-        hls_storage_path = video_path  # Use the provided path directly
-        logger.info(f"Will upload HLS files to path: {hls_storage_path}")
-        
-        # First, list all files we need to upload
-        files_to_upload = []
-        for root, _, files in os.walk(hls_dir):
-            for file in files:
-                local_path = os.path.join(root, file)
-                relative_path = os.path.relpath(local_path, hls_dir)
-                blob_path = f"{hls_storage_path}/{relative_path}"
-                files_to_upload.append((local_path, blob_path, file))
-                logger.info(f"Will upload {local_path} to {blob_path}")
-        
-        # Now upload each file
-        master_url = None
-        for local_path, blob_path, filename in files_to_upload:
-            try:
-                # Verify file exists and is readable
-                if not os.path.exists(local_path):
-                    raise ValueError(f"File not found: {local_path}")
-                
-                file_size = os.path.getsize(local_path)
-                logger.info(f"Uploading {filename} ({file_size} bytes) to {blob_path}")
-                
-                # Set content type based on file extension
-                if filename.endswith('.m3u8'):
-                    content_type = 'application/vnd.apple.mpegurl'
-                elif filename.endswith('.ts'):
-                    content_type = 'video/mp2t'
-                else:
-                    content_type = 'application/octet-stream'
-                
-                # Create blob and set its properties
-                blob = bucket.blob(blob_path)
-                blob.content_type = content_type
-                
-                # Upload the file with retry
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        with open(local_path, 'rb') as f:
-                            blob.upload_from_file(
-                                f,
-                                content_type=content_type,
-                                predefined_acl='publicRead'
-                            )
-                            logger.info(f"Upload successful for {filename}")
-                        break
-                    except Exception as e:
-                        logger.error(f"Upload attempt {attempt + 1} failed for {filename}: {str(e)}")
-                        if attempt == max_retries - 1:
-                            raise
-                        continue
-                
-                # Set cache control based on file type
-                if filename == 'master.m3u8':
-                    blob.cache_control = 'public, max-age=3600'  # 1 hour for master playlist
-                    master_url = f"https://storage.googleapis.com/{bucket.name}/{blob_path}"
-                elif filename.endswith('.m3u8'):
-                    blob.cache_control = 'public, max-age=3600'  # 1 hour for variant playlists
-                else:
-                    blob.cache_control = 'public, max-age=31536000'  # 1 year for segments
-                
-                # Update the blob
-                blob.patch()
-                logger.info(f"Updated metadata for {filename}")
-                
-            except Exception as e:
-                logger.error(f"Error uploading {filename}: {str(e)}")
-                raise
-        
-        if not master_url:
-            raise ValueError("Failed to upload master playlist")
+            if on_publish:
+                assets = thumbnail_urls(store, video_path, thumbnail_plan) if thumbnail_plan else {}
+                with span('publish'):
+                    on_publish(master_url, [r['name'] for r in published], is_final, assets)
         
         logger.info(f"Successfully created HLS stream at {master_url}")
         return master_url
@@ -234,18 +390,17 @@ def on_bit_created(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) ->
             return
             
         # Get the associated video document
-        db = firestore.client()
-        video_docs = db.collection('videos').where('storageUrl', '==', video_url).limit(1).get()
-        if not video_docs:
+        db = get_firestore_client()
+        video_doc = find_video_doc(db, bit_data)
+        if not video_doc:
             print("No associated video document found")
             return
             
-        video_doc = video_docs[0]
         video_data = video_doc.to_dict()
         
-        # Check if this video is in processing status
+        # Check if this video is in processing status (partial if a crashed worker got that far)
         status = video_data.get('status')
-        if status != VideoStatus.processing.name:
+        if status not in (VideoStatus.processing.name, VideoStatus.partial.name):
             print(f"Video status is {status}, not processing. Skipping.")
             return
             
@@ -253,50 +408,70 @@ def on_bit_created(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) ->
         if video_data.get('isProcessed'):
             print("Video already processed")
             return
+        
+        # Events are delivered at least once; only the event holding the lease transcodes
+        lease = claim_lease(db, video_doc.reference, 'hls', event.id)
+        if lease is None:
+            return
             
+        trace = Trace('hls', videoId=video_doc.id, bitId=event.data.id, eventId=event.id)
+        # Renditions published so far, and the status of the last successful publish;
+        # the error path keeps that status rather than inferring one from the exception
+        timed_renditions = set()
+        published_status = {'status': VideoStatus.error.name}
         try:
-            logger.info(f"Downloading video from URL: {video_url}")
-            # Download video data from URL (matching transcripts.py approach)
-            response = requests.get(video_url)
-            response.raise_for_status()  # Raise an error for bad status codes
-            
-            # Save video data to a temporary file
-            video_path = os.path.join(tempfile.gettempdir(), 'video.mp4')
-            with open(video_path, "wb") as f:
-                f.write(response.content)
-
             # Use video ID for HLS storage path
             storage_path = f'hls/{video_doc.id}'
+            video_doc.reference.update({
+                'processingStartTime': firestore.SERVER_TIMESTAMP
+            })
             
-            try:
-                # Create HLS stream using the Firebase download URL
-                hls_url = create_hls_stream(video_url, storage_path)
-                logger.info(f"HLS stream created successfully: {hls_url}")
-                
-                # Update the video document with HLS URL
-                video_doc.reference.update({
-                    'hlsUrl': hls_url,
-                    'status': VideoStatus.ready.name,
-                    'processingEndTime': firestore.SERVER_TIMESTAMP,
-                    'isProcessed': True
-                })
-                logger.info(f"Successfully processed video {video_doc.id}")
-            finally:
-                # Clean up temporary file
-                if os.path.exists(video_path):
-                    os.remove(video_path)
-                    logger.info("Cleaned up temporary video file")
+            def publish(master_url: str, renditions: List[str], is_final: bool, assets: Dict) -> None:
+                """Point the video at the latest master playlist (and poster/thumbnails) as each rung lands."""
+                update = {
+                    'hlsUrl': master_url,
+                    'renditions': renditions,
+                    **assets,
+                }
+                if not timed_renditions:
+                    update['firstPlayableTime'] = firestore.SERVER_TIMESTAMP
+                for rendition in renditions:
+                    if rendition not in timed_renditions:
+                        update[f'renditionReadyTimes.{rendition}'] = firestore.SERVER_TIMESTAMP
+                        timed_renditions.add(rendition)
+                if is_final:
+                    update['status'] = VideoStatus.ready.name
+                    update['processingEndTime'] = firestore.SERVER_TIMESTAMP
+                    update['isProcessed'] = True
+                else:
+                    update['status'] = VideoStatus.partial.name
+                video_doc.reference.update(update)
+                published_status['status'] = update['status']
+                logger.info(f"Video {video_doc.id} is {update['status']} with {', '.join(renditions)}")
+            
+            # Create HLS stream using the Firebase download URL, timing every stage
+            with trace.span('hls'):
+                hls_url = create_hls_stream(video_url, storage_path, on_publish=publish)
+            logger.info(f"HLS stream created successfully: {hls_url}")
+            logger.info(f"Successfully processed video {video_doc.id}")
+            video_doc.reference.update({'timings.hls': trace.summary()})
+            lease.complete()
             
         except Exception as e:
             logger.error(f"Error processing video {video_doc.id}: {str(e)}")
             logger.error(f"Stack trace:", exc_info=True)
-            # Update video document with error status
-            video_doc.reference.update({
-                'status': VideoStatus.error.name,
-                'error': str(e),
-                'processingEndTime': firestore.SERVER_TIMESTAMP,
-                'isProcessed': False
-            })
+            # Published rungs still play: a failure after the final publish leaves the video ready,
+            # one mid-ladder leaves it partial with the renditions it has, and only a video
+            # with nothing published is in error. The trigger does not retry, so this is final.
+            update = {'error': str(e), 'timings.hls': trace.summary()}
+            if published_status['status'] != VideoStatus.ready.name:
+                update.update({
+                    'status': published_status['status'],
+                    'processingEndTime': firestore.SERVER_TIMESTAMP,
+                    'isProcessed': False,
+                })
+            video_doc.reference.update(update)
+            lease.release(str(e))
             raise
         
     except Exception as e:
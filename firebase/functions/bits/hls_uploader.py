@@ -0,0 +1,163 @@
+import os
+import shutil
+import random
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+# Configure logging
+logger = logging.getLogger('hls_uploader')
+logger.setLevel(logging.INFO)
+
+MAX_WORKERS = 8
+MAX_RETRIES = 3
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 8.0
+
+PLAYLIST_CACHE_CONTROL = 'public, max-age=3600'  # 1 hour for master and variant playlists
+INTERIM_PLAYLIST_CACHE_CONTROL = 'no-cache'  # interim masters are rewritten as higher rungs land
+SEGMENT_CACHE_CONTROL = 'public, max-age=31536000'  # 1 year for segments
+
+def get_content_type(filename: str) -> str:
+    """Content type for an HLS output file (or poster/thumbnail asset) based on its extension."""
+    if filename.endswith('.m3u8'):
+        return 'application/vnd.apple.mpegurl'
+    if filename.endswith('.ts'):
+        return 'video/mp2t'
+    if filename.endswith('.jpg'):
+        return 'image/jpeg'
+    if filename.endswith('.webp'):
+        return 'image/webp'
+    if filename.endswith('.vtt'):
+        return 'text/vtt'
+    return 'application/octet-stream'
+
+def get_cache_control(filename: str) -> str:
+    """Cache-Control for an HLS output file: playlists may change, segments and thumbnails never do."""
+    if filename.endswith('.m3u8'):
+        return PLAYLIST_CACHE_CONTROL
+    return SEGMENT_CACHE_CONTROL
+
+class BlobStore(ABC):
+    """Destination for uploaded files. Subclasses target GCS or a local directory."""
+
+    @abstractmethod
+    def upload_file(self, local_path: str, blob_path: str, content_type: str, cache_control: str) -> None:
+        ...
+
+    @abstractmethod
+    def public_url(self, blob_path: str) -> str:
+        ...
+
+class GcsBlobStore(BlobStore):
+    """Uploads to a google-cloud-storage bucket (or any bucket-like fake exposing blob())."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def upload_file(self, local_path: str, blob_path: str, content_type: str, cache_control: str) -> None:
+        blob = self.bucket.blob(blob_path)
+        # Properties set before the upload are sent with it, so no follow-up patch() is needed
+        blob.cache_control = cache_control
+        blob.content_type = content_type
+        blob.upload_from_filename(
+            local_path,
+            content_type=content_type,
+            predefined_acl='publicRead'
+        )
+
+    def public_url(self, blob_path: str) -> str:
+        # GCS decodes the URL path, so escape the object name to keep characters like '%' literal
+        return f"https://storage.googleapis.com/{self.bucket.name}/{quote(blob_path)}"
+
+class LocalBlobStore(BlobStore):
+    """Copies files under a root directory, for local runs and tests."""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def upload_file(self, local_path: str, blob_path: str, content_type: str, cache_control: str) -> None:
+        destination = os.path.join(self.root_dir, blob_path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(local_path, destination)
+
+    def public_url(self, blob_path: str) -> str:
+        return f"file://{os.path.abspath(os.path.join(self.root_dir, blob_path))}"
+
+def upload_with_retry(store: BlobStore, local_path: str, blob_path: str, cache_control: Optional[str] = None) -> Dict:
+    """Upload one file, retrying with jittered exponential backoff. Returns per-file stats."""
+    filename = os.path.basename(local_path)
+    file_size = os.path.getsize(local_path)
+    cache_control = cache_control or get_cache_control(filename)
+    start = time.perf_counter()
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            store.upload_file(local_path, blob_path, get_content_type(filename), cache_control)
+            break
+        except Exception as e:
+            logger.error(f"Upload attempt {attempt} failed for {filename}: {str(e)}")
+            if attempt == MAX_RETRIES:
+                raise
+            # Full jitter keeps parallel retries from hitting the bucket in lockstep
+            time.sleep(random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)))
+    seconds = time.perf_counter() - start
+    return {
+        'blobPath': blob_path,
+        'bytes': file_size,
+        'seconds': seconds,
+        'attempts': attempt,
+        'bytesPerSecond': file_size / seconds if seconds else 0.0,
+    }
+
+def summarize_uploads(results: List[Dict], seconds: float) -> Dict:
+    """Aggregate per-file upload stats into a throughput report."""
+    total_bytes = sum(result['bytes'] for result in results)
+    report = {
+        'files': results,
+        'fileCount': len(results),
+        'bytes': total_bytes,
+        'seconds': seconds,
+        'bytesPerSecond': total_bytes / seconds if seconds else 0.0,
+    }
+    logger.info(f"Uploaded {len(results)} files ({total_bytes} bytes) in {seconds:.2f}s "
+                f"({report['bytesPerSecond'] / 1e6:.2f} MB/s)")
+    return report
+
+def upload_files(store: BlobStore, files: List[Tuple[str, str]], max_workers: int = MAX_WORKERS) -> List[Dict]:
+    """Upload (local_path, blob_path) pairs concurrently on a bounded thread pool."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(upload_with_retry, store, local_path, blob_path) for local_path, blob_path in files]
+        return [future.result() for future in futures]
+
+def upload_hls_directory(store: BlobStore, hls_dir: str, storage_path: str, max_workers: int = MAX_WORKERS,
+                         final: bool = True) -> Dict:
+    """
+    Upload every file under hls_dir to storage_path.
+    The master playlist goes last so it never references variants that are not uploaded yet.
+    A non-final master is uploaded uncached because it will be overwritten.
+    Returns per-file stats, aggregate throughput and the master playlist URL.
+    """
+    files = []
+    master = None
+    for root, _, filenames in os.walk(hls_dir):
+        for filename in filenames:
+            local_path = os.path.join(root, filename)
+            relative_path = os.path.relpath(local_path, hls_dir).replace(os.sep, '/')
+            blob_path = f"{storage_path}/{relative_path}"
+            if relative_path == 'master.m3u8':
+                master = (local_path, blob_path)
+            else:
+                files.append((local_path, blob_path))
+    if not master:
+        raise ValueError("Failed to upload master playlist")
+
+    start = time.perf_counter()
+    results = upload_files(store, files, max_workers)
+    master_cache_control = PLAYLIST_CACHE_CONTROL if final else INTERIM_PLAYLIST_CACHE_CONTROL
+    results.append(upload_with_retry(store, *master, cache_control=master_cache_control))
+    report = summarize_uploads(results, time.perf_counter() - start)
+    report['masterUrl'] = store.public_url(master[1])
+    return report
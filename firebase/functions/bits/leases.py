@@ -0,0 +1,99 @@
+import time
+import logging
+from enum import Enum
+from typing import Optional
+from firebase_admin import firestore
+
+# Configure logging
+logger = logging.getLogger('leases')
+logger.setLevel(logging.INFO)
+
+# Longer than any bits trigger's timeout (on_bit_created allows 540s), so a lease that
+# runs out means its worker died rather than that it is still busy
+DEFAULT_LEASE_SECONDS = 600
+
+class LeaseState(str, Enum):
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
+class Lease:
+    """A claimed leases.<pipeline> entry on a document, owned by one event."""
+
+    def __init__(self, db, doc_ref, pipeline: str, event_id: str):
+        self.db = db
+        self.doc_ref = doc_ref
+        self.pipeline = pipeline
+        self.event_id = event_id
+
+    def _finish(self, state: LeaseState, error: Optional[str] = None) -> bool:
+        field = f'leases.{self.pipeline}'
+
+        @firestore.transactional
+        def finish(transaction) -> bool:
+            snapshot = self.doc_ref.get(transaction=transaction)
+            lease = _get_lease(snapshot, self.pipeline)
+            if lease.get('owner') != self.event_id:
+                # Our lease expired and another event took over; leave its claim alone
+                return False
+            update = {f'{field}.state': state.name, f'{field}.finishedAt': time.time()}
+            if error is not None:
+                update[f'{field}.error'] = error
+            if state == LeaseState.failed:
+                update[f'{field}.expiresAt'] = 0
+            transaction.update(self.doc_ref, update)
+            return True
+
+        finished = finish(self.db.transaction())
+        if not finished:
+            logger.warning(f"Lost {self.pipeline} lease on {self.doc_ref.id} before marking it {state.name}")
+        return finished
+
+    def complete(self) -> bool:
+        """Mark the work done so redeliveries of this or any other event skip it."""
+        return self._finish(LeaseState.done)
+
+    def release(self, error: str) -> bool:
+        """Give the lease up after a failure so a retry can claim it straight away."""
+        return self._finish(LeaseState.failed, error)
+
+def _get_lease(snapshot, pipeline: str) -> dict:
+    data = snapshot.to_dict() or {}
+    return (data.get('leases') or {}).get(pipeline) or {}
+
+def claim_lease(db, doc_ref, pipeline: str, event_id: str,
+                lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Lease]:
+    """
+    Atomically claim the pipeline's lease on doc_ref for event_id.
+    Returns None when the work is already done or another live worker holds the lease,
+    including a redelivery of the same event while its first delivery is still running.
+    An expired or failed lease is taken over.
+    """
+    field = f'leases.{pipeline}'
+
+    @firestore.transactional
+    def claim(transaction) -> Optional[str]:
+        snapshot = doc_ref.get(transaction=transaction)
+        lease = _get_lease(snapshot, pipeline)
+        now = time.time()
+        if lease.get('state') == LeaseState.done.name:
+            return f"already done by event {lease.get('owner')}"
+        if lease.get('state') == LeaseState.running.name and lease.get('expiresAt', 0) > now:
+            return f"held by event {lease.get('owner')} for another {lease['expiresAt'] - now:.0f}s"
+        if lease.get('state') == LeaseState.running.name:
+            logger.warning(f"Taking over expired {pipeline} lease of event {lease.get('owner')} on {doc_ref.id}")
+        transaction.update(doc_ref, {field: {
+            'owner': event_id,
+            'state': LeaseState.running.name,
+            'claimedAt': now,
+            'expiresAt': now + lease_seconds,
+            'attempts': lease.get('attempts', 0) + 1,
+        }})
+        return None
+
+    reason = claim(db.transaction())
+    if reason:
+        logger.info(f"Skipping {pipeline} for {doc_ref.id}: {reason}")
+        return None
+    logger.info(f"Event {event_id} claimed {pipeline} lease on {doc_ref.id}")
+    return Lease(db, doc_ref, pipeline, event_id)
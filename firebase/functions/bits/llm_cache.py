@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from .clients import get_firestore_client
+
+# Configure logging
+logger = logging.getLogger('llm_cache')
+logger.setLevel(logging.INFO)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+MEMORY_MAX_ENTRIES = 512
+# Empty disables the Firestore tier (e.g. for local runs without Firebase credentials)
+PERSISTENT_COLLECTION = os.getenv('LLM_CACHE_COLLECTION', 'llm_cache')
+
+_WHITESPACE = re.compile(r'\s+')
+
+def cache_key(model: str, messages: list, **params) -> str:
+    """Hash of model, prompt and parameters; whitespace differences in prompts don't matter."""
+    normalized = {
+        'model': model,
+        'messages': [
+            {'role': message['role'], 'content': _WHITESPACE.sub(' ', message['content']).strip()}
+            for message in messages
+        ],
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+class MemoryCache:
+    """Per-instance LRU cache with TTL."""
+
+    def __init__(self, max_entries: int = MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+class FirestoreCache:
+    """
+    Cache tier shared by all instances, one document per key.
+    Expired documents are ignored on read and deleted by the TTL policy on expiresAt
+    (firestore.indexes.json); TTL policies need the field to be a timestamp.
+    """
+
+    def __init__(self, collection: str = PERSISTENT_COLLECTION, db=None):
+        self.collection = collection
+        self.db = db
+
+    def _collection(self):
+        if self.db is None:
+            self.db = get_firestore_client()
+        return self.db.collection(self.collection)
+
+    def get(self, key: str) -> Optional[str]:
+        doc = self._collection().document(key).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        expires_at = data.get('expiresAt')
+        # Entries written before expiresAt became a timestamp are treated as expired and rewritten
+        if not isinstance(expires_at, datetime) or expires_at < datetime.now(timezone.utc):
+            return None
+        return data['value']
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+        self._collection().document(key).set({'value': value, 'expiresAt': expires_at})
+
+class LLMCache:
+    """Two-tier cache (memory, then persistent) with hit/miss counters."""
+
+    def __init__(self, memory: Optional[MemoryCache] = None, persistent=None, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.memory = memory or MemoryCache()
+        self.persistent = persistent
+        self.ttl_seconds = ttl_seconds
+        self.stats = {'memoryHits': 0, 'persistentHits': 0, 'misses': 0, 'errors': 0}
+        self.stats_lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('memoryHits')
+            return value
+        if self.persistent is not None:
+            try:
+                value = self.persistent.get(key)
+            except Exception as e:
+                # The cache is best effort; never fail the request because of it
+                logger.error(f"Persistent cache read failed: {str(e)}")
+                self._count('errors')
+            if value is not None:
+                self._count('persistentHits')
+                self.memory.set(key, value, self.ttl_seconds)
+                return value
+        self._count('misses')
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value, self.ttl_seconds)
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, value, self.ttl_seconds)
+            except Exception as e:
+                logger.error(f"Persistent cache write failed: {str(e)}")
+                self._count('errors')
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMCache:
+    """Process-wide cache used by the bit pipeline."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            persistent = FirestoreCache() if PERSISTENT_COLLECTION else None
+            _default_cache = LLMCache(persistent=persistent)
+        return _default_cache
+
+def cached_chat_completion_with_usage(client, model: str, messages: list, cache: Optional[LLMCache] = None,
+                                      validate: Optional[Callable[[str], bool]] = None,
+                                      use_cache: bool = True, **params) -> Tuple[str, Dict]:
+    """
+    Like cached_chat_completion, also returning token usage for the call.
+    Cache hits report zero tokens and cached=True.
+    With use_cache=False the call always reaches the model and nothing is stored, for sampled
+    (creative) output where asking again should give a new answer.
+    """
+    cache = (cache or get_llm_cache()) if use_cache else None
+    key = cache_key(model, messages, **params)
+    content = cache.get(key) if cache is not None else None
+    if content is not None:
+        logger.info(f"LLM cache hit {key[:12]} ({cache.stats})")
+        return content, {'promptTokens': 0, 'completionTokens': 0, 'cached': True}
+    response = client.chat.completions.create(model=model, messages=messages, **params)
+    content = response.choices[0].message.content
+    if cache is not None and (validate is None or validate(content)):
+        cache.set(key, content)
+    usage = getattr(response, 'usage', None)
+    return content, {
+        'promptTokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completionTokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'cached': False,
+    }
+
+def cached_chat_completion(client, model: str, messages: list, cache: Optional[LLMCache] = None,
+                           validate: Optional[Callable[[str], bool]] = None, **params) -> str:
+    """
+    Return the message content of a chat completion, reusing a cached answer for an identical
+    model, prompt and parameters. Answers failing validate are returned but not cached.
+    """
+    return cached_chat_completion_with_usage(client, model, messages, cache, validate, **params)[0]
+
+def stream_chat_completion(client, model: str, messages: list, cache: Optional[LLMCache] = None,
+                           use_cache: bool = True, **params) -> Iterator[Dict]:
+    """
+    Yield {'delta': text} as tokens arrive, then {'content': full_text, 'usage': {...}}.
+    Shares cache entries with cached_chat_completion for the same model, prompt and parameters;
+    a cache hit is yielded as one delta. use_cache=False bypasses the cache entirely.
+    """
+    cache = (cache or get_llm_cache()) if use_cache else None
+    key = cache_key(model, messages, **params)
+    content = cache.get(key) if cache is not None else None
+    if content is not None:
+        yield {'delta': content}
+        yield {'content': content, 'usage': {'promptTokens': 0, 'completionTokens': 0, 'cached': True}}
+        return
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True,
+                                            stream_options={'include_usage': True}, **params)
+    parts = []
+    usage = None
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield {'delta': chunk.choices[0].delta.content}
+        # The last chunk carries usage and no choices
+        if getattr(chunk, 'usage', None):
+            usage = chunk.usage
+    content = ''.join(parts)
+    if cache is not None:
+        cache.set(key, content)
+    yield {'content': content, 'usage': {
+        'promptTokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completionTokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'cached': False,
+    }}
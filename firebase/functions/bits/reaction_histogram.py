@@ -0,0 +1,162 @@
+import time
+import random
+import logging
+from typing import Dict, List, Optional
+from firebase_admin import firestore
+from firebase_functions import firestore_fn, scheduler_fn
+from .clients import get_firestore_client
+from .reaction_metrics import update_structure_metrics
+
+# Configure logging
+logger = logging.getLogger('reaction_histogram')
+logger.setLevel(logging.INFO)
+
+# Width of one histogram bucket in seconds of video time
+BUCKET_SECONDS = 1
+# Counter shards per bit; each absorbs a share of the writes of a hot bit
+SHARD_COUNT = 10
+# The stats doc is rewritten from the shards at most this often per bit
+ROLLUP_INTERVAL_SECONDS = 5
+SHARDS_COLLECTION = 'histogramShards'
+# Stats docs rolled up per run of the scheduled sweep
+SWEEP_LIMIT = 500
+
+def bucket_key(timestamp: float) -> str:
+    """Map field name for the bucket holding a video timestamp (field names can't start with a digit)."""
+    return f"b{int(max(timestamp, 0) // BUCKET_SECONDS)}"
+
+def get_stats_ref(bit_ref):
+    return bit_ref.collection('analytics').document('stats')
+
+def increment_histogram(bit_ref, reaction_type: str, timestamp: float, amount: int = 1,
+                        shard: Optional[int] = None) -> None:
+    """Add amount to the reaction type's bucket in a random counter shard (created on first write)."""
+    shard = random.randrange(SHARD_COUNT) if shard is None else shard
+    shard_ref = get_stats_ref(bit_ref).collection(SHARDS_COLLECTION).document(str(shard))
+    shard_ref.set({'counts': {reaction_type: {bucket_key(timestamp): firestore.Increment(amount)}}}, merge=True)
+
+def merge_shards(shard_docs) -> Dict[str, List[int]]:
+    """Sum shard counters into {type: [count per bucket]} lists starting at bucket 0."""
+    totals = {}
+    for shard in shard_docs:
+        for reaction_type, buckets in ((shard.to_dict() or {}).get('counts') or {}).items():
+            type_totals = totals.setdefault(reaction_type, {})
+            for key, count in buckets.items():
+                index = int(key[1:])
+                type_totals[index] = type_totals.get(index, 0) + count
+    histogram = {}
+    for reaction_type, type_totals in totals.items():
+        counts = [0] * (max(type_totals) + 1 if type_totals else 0)
+        for index, count in type_totals.items():
+            counts[index] = max(count, 0)
+        histogram[reaction_type] = counts
+    return histogram
+
+def read_histogram(bit_ref) -> Dict[str, List[int]]:
+    """Exact histogram summed from the shards, for readers that can't wait for the next rollup."""
+    return merge_shards(get_stats_ref(bit_ref).collection(SHARDS_COLLECTION).stream())
+
+def claim_rollup(db, stats_ref) -> bool:
+    """
+    Claim the current rollup window in a transaction, so concurrent triggers on a hot bit
+    don't all rewrite the stats doc; returns False when the last rollup is recent.
+    A caller that loses flags the doc histogramPending (once per window), and
+    sweep_pending_histograms rolls it up if no later reaction does.
+    """
+    @firestore.transactional
+    def claim(transaction) -> bool:
+        stats = stats_ref.get(transaction=transaction)
+        data = (stats.to_dict() or {}) if stats.exists else {}
+        now = time.time()
+        if now - data.get('reactionHistogram', {}).get('rolledUpAt', 0) < ROLLUP_INTERVAL_SECONDS:
+            if not data.get('histogramPending'):
+                transaction.set(stats_ref, {'histogramPending': True}, merge=True)
+            return False
+        # The winner's shard read comes after this commit, so it covers every reaction flagged so far
+        transaction.set(stats_ref, {'reactionHistogram': {'rolledUpAt': now}, 'histogramPending': False}, merge=True)
+        return True
+
+    return claim(db.transaction())
+
+def rollup_histogram(db, bit_ref, force: bool = False) -> Optional[Dict[str, List[int]]]:
+    """
+    Copy the summed shards into reactionHistogram on the stats doc and return them.
+    Unless forced, the caller must first claim the rollup window (claim_rollup); otherwise
+    it returns None without reading the shards, so the stats doc takes one rollup per
+    interval however hot the bit is.
+    """
+    stats_ref = get_stats_ref(bit_ref)
+    if not force and not claim_rollup(db, stats_ref):
+        return None
+    histogram = read_histogram(bit_ref)
+    stats_ref.set({'reactionHistogram': {
+        'bucketSeconds': BUCKET_SECONDS,
+        'counts': histogram,
+        'rolledUpAt': time.time(),
+    }}, merge=True)
+    return histogram
+
+def backfill_histogram(db, bit_ref) -> Dict[str, List[int]]:
+    """
+    Rebuild a bit's shards from its reactions subcollection and roll them up.
+    Counts go into shard 0 and the other shards are cleared, in one batch per bit.
+    Also corrects drift from redelivered trigger events, which increment twice.
+    """
+    counts = {}
+    for reaction in bit_ref.collection('reactions').stream():
+        data = reaction.to_dict() or {}
+        if not data.get('type') or data.get('timestamp') is None:
+            continue
+        type_counts = counts.setdefault(data['type'], {})
+        key = bucket_key(data['timestamp'])
+        type_counts[key] = type_counts.get(key, 0) + 1
+
+    shards = get_stats_ref(bit_ref).collection(SHARDS_COLLECTION)
+    batch = db.batch()
+    batch.set(shards.document('0'), {'counts': counts})
+    for shard in range(1, SHARD_COUNT):
+        batch.delete(shards.document(str(shard)))
+    batch.commit()
+    histogram = rollup_histogram(db, bit_ref, force=True)
+    update_structure_metrics(db, bit_ref, histogram, BUCKET_SECONDS)
+    return histogram
+
+def apply_reaction(event: firestore_fn.Event[firestore_fn.DocumentSnapshot], amount: int) -> None:
+    reaction = event.data.to_dict() if event.data else None
+    if not reaction or not reaction.get('type') or reaction.get('timestamp') is None:
+        logger.info(f"Ignoring reaction without type or timestamp on bit {event.params['bitId']}")
+        return
+    db = get_firestore_client()
+    bit_ref = db.collection('bits').document(event.params['bitId'])
+    increment_histogram(bit_ref, reaction['type'], reaction['timestamp'], amount)
+    # Structure metrics are refreshed from the histogram whenever it is rolled up
+    histogram = rollup_histogram(db, bit_ref)
+    if histogram is not None:
+        update_structure_metrics(db, bit_ref, histogram, BUCKET_SECONDS)
+
+def on_reaction_created(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    """Count a new reaction into its bit's timeline histogram."""
+    apply_reaction(event, 1)
+
+def on_reaction_deleted(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    """Take a removed reaction (the app toggles reactions off) back out of the histogram."""
+    apply_reaction(event, -1)
+
+def sweep_pending_histograms(event: scheduler_fn.ScheduledEvent) -> None:
+    """Roll up bits whose last reactions landed inside a throttle window, so no reaction stays out of the stats doc."""
+    db = get_firestore_client()
+    pending = db.collection_group('analytics').where('histogramPending', '==', True).limit(SWEEP_LIMIT).stream()
+    swept = 0
+    for stats in pending:
+        bit_ref = stats.reference.parent.parent
+        if bit_ref is None or bit_ref.parent.id != 'bits':
+            continue
+        try:
+            # Cleared before the shards are read, so a reaction landing after the read flags the doc again
+            stats.reference.update({'histogramPending': False})
+            histogram = rollup_histogram(db, bit_ref, force=True)
+            update_structure_metrics(db, bit_ref, histogram, BUCKET_SECONDS)
+            swept += 1
+        except Exception as e:
+            logger.error(f"Error rolling up reaction histogram of bit {bit_ref.id}: {str(e)}")
+    logger.info(f"Rolled up {swept} pending reaction histograms")
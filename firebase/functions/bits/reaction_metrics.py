@@ -0,0 +1,126 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger('reaction_metrics')
+logger.setLevel(logging.INFO)
+
+# Reactions that count as laughs
+LAUGH_REACTIONS = ('rofl', 'smirk')
+
+def get_beat_spans(timeline: List[Dict]) -> np.ndarray:
+    """
+    (start, end) seconds of every beat: the aligned startTime/endTime where present,
+    otherwise laid end to end by durationSeconds (template structures).
+    """
+    spans = np.zeros((len(timeline), 2))
+    cursor = 0.0
+    for i, beat in enumerate(timeline):
+        start = beat.get('startTime', cursor)
+        end = beat.get('endTime', start + float(beat.get('durationSeconds') or 0))
+        spans[i] = (start, max(end, start))
+        cursor = spans[i, 1]
+    return spans
+
+class ReactionMetrics:
+    """
+    Laugh counts per time bucket joined to a structure's beat spans.
+    Built from the rolled-up histogram; each bucket is assigned to one beat, so an update
+    costs O((buckets + beats) log beats) however many reactions the bit has.
+    """
+
+    def __init__(self, timeline: List[Dict], bucket_seconds: float):
+        self.beat_types = [beat.get('type') for beat in timeline]
+        self.spans = get_beat_spans(timeline)
+        self.bucket_seconds = bucket_seconds
+        self.counts = np.zeros(int(np.ceil(self.spans[:, 1].max() / bucket_seconds)) + 1 if len(timeline) else 1)
+
+    @classmethod
+    def from_histogram(cls, timeline: List[Dict], histogram: Dict[str, List[int]],
+                       bucket_seconds: float) -> 'ReactionMetrics':
+        """Seed from a reaction timeline histogram ({type: [count per bucket]})."""
+        metrics = cls(timeline, bucket_seconds)
+        for reaction_type in LAUGH_REACTIONS:
+            counts = np.asarray(histogram.get(reaction_type, []), dtype=float)
+            metrics._grow(len(counts))
+            metrics.counts[:len(counts)] += counts
+        return metrics
+
+    def _grow(self, size: int) -> None:
+        if size > len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(size - len(self.counts))])
+
+    def bucket_beats(self) -> np.ndarray:
+        """
+        Index of the beat owning each bucket, or -1 outside every beat.
+        A bucket belongs to the beat whose span holds its midpoint, so adjacent beats never share one;
+        a beat too short to hold any midpoint (a quick punchline) takes the bucket its start falls in.
+        """
+        owners = np.full(len(self.counts), -1)
+        if not len(self.spans):
+            return owners
+        midpoints = (np.arange(len(self.counts)) + 0.5) * self.bucket_seconds
+        order = np.argsort(self.spans[:, 0], kind='stable')
+        starts, ends = self.spans[order, 0], self.spans[order, 1]
+        candidates = np.searchsorted(starts, midpoints, side='right') - 1
+        inside = (candidates >= 0) & (midpoints < ends[np.maximum(candidates, 0)])
+        owners[inside] = order[candidates[inside]]
+        buckets_held = np.bincount(owners[owners >= 0], minlength=len(self.spans))
+        short = np.flatnonzero((buckets_held == 0) & (self.spans[:, 1] > self.spans[:, 0]))
+        first = np.floor(self.spans[short, 0] / self.bucket_seconds).astype(int)
+        keep = first < len(self.counts)
+        owners[first[keep]] = short[keep]
+        return owners
+
+    def beat_counts(self) -> np.ndarray:
+        """Laughs inside each beat's span, each bucket counted for exactly one beat (see bucket_beats)."""
+        owners = self.bucket_beats()
+        owned = owners >= 0
+        return np.bincount(owners[owned], weights=self.counts[owned], minlength=len(self.spans))
+
+    def metrics(self) -> Dict:
+        """laughDensity (laughs per minute of the structure), peakReactionTimestamp and callbackEffectiveness."""
+        if not len(self.spans):
+            return {}
+        beat_counts = self.beat_counts()
+        durations = np.maximum(self.spans[:, 1] - self.spans[:, 0], self.bucket_seconds)
+        rates = beat_counts / durations
+        total_seconds = max(self.spans[-1, 1] - self.spans[0, 0], self.bucket_seconds)
+        result = {
+            'laughDensity': round(float(beat_counts.sum()) / total_seconds * 60, 2),
+            'peakReactionTimestamp': float(np.argmax(self.counts) * self.bucket_seconds) if self.counts.any() else None,
+            'reactionCount': int(self.counts.sum()),
+            'beatReactionCounts': [int(count) for count in beat_counts],
+        }
+        # How well callbacks land compared with the best punchline, from 0 to 1
+        callbacks = np.array([beat_type == 'callback' for beat_type in self.beat_types])
+        punchlines = np.array([beat_type == 'punchline' for beat_type in self.beat_types])
+        if callbacks.any():
+            best = rates[punchlines].max() if punchlines.any() else rates.max()
+            result['callbackEffectiveness'] = round(float(min(rates[callbacks].mean() / best, 1.0)), 2) if best else 0.0
+        return result
+
+def get_structure_ref(db, bit_data: Dict):
+    """The comedy structure analyzed from a bit's transcript, if it has one."""
+    structure_id = bit_data.get('analyzedStructureId')
+    if not structure_id or not bit_data.get('userId'):
+        return None
+    return db.collection('users').document(bit_data['userId']).collection('comedy_structures').document(structure_id)
+
+def update_structure_metrics(db, bit_ref, histogram: Dict[str, List[int]],
+                             bucket_seconds: float) -> Optional[Dict]:
+    """Recompute the metrics of the bit's analyzed structure from its latest reaction histogram."""
+    bit = bit_ref.get()
+    structure_ref = get_structure_ref(db, bit.to_dict() or {}) if bit.exists else None
+    if structure_ref is None:
+        return None
+    structure = structure_ref.get()
+    if not structure.exists:
+        return None
+    timeline = (structure.to_dict() or {}).get('timeline') or []
+    metrics = ReactionMetrics.from_histogram(timeline, histogram, bucket_seconds).metrics()
+    structure_ref.update({'metrics': metrics, 'updatedAt': datetime.now()})
+    logger.info(f"Updated metrics of structure {structure_ref.id} for bit {bit_ref.id}: {metrics}")
+    return metrics
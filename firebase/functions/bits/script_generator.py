@@ -1,28 +1,31 @@
+import json
 import logging
-from openai import OpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
 from firebase_functions import https_fn
-import os
+from .clients import get_openai_client
+from .llm_cache import cached_chat_completion_with_usage, stream_chat_completion
 
 logger = logging.getLogger(__name__)
 
-@https_fn.on_call()
-def generate_beat_script(req: https_fn.Request) -> https_fn.Response:
-    """Generate a script for a comedy beat based on the structure context."""
-    try:
-        # Get data from request
-        data = req.data
-        beat_type = data.get('beatType')
-        beat_description = data.get('description')
-        previous_beats = data.get('previousBeats', [])
-        
-        # Create context from previous beats
-        context = "\n".join([
-            f"{beat['type']}: {beat['description']}"
-            for beat in previous_beats
-        ])
-        
-        # Construct prompt
-        prompt = f"""Context of previous beats in the comedy structure:
+SYSTEM_PROMPT = "You are a comedy writer helping create natural, conversational scripts for standup comedy bits."
+# Beats of a timeline generated at once per batch request
+BATCH_MAX_WORKERS = 4
+# A timeline's beats only get the most recent beats as context, so a batch's total prompt
+# size grows linearly with the timeline instead of quadratically
+MAX_CONTEXT_BEATS = 6
+
+def build_beat_messages(beat_type: str, beat_description: str, previous_beats: List[Dict]) -> List[Dict]:
+    """Chat messages asking for one beat's script given the beats before it."""
+    # Create context from previous beats
+    context = "\n".join([
+        f"{beat.get('type', 'beat')}: {beat.get('description', '')}"
+        for beat in previous_beats
+    ])
+
+    # Construct prompt
+    prompt = f"""Context of previous beats in the comedy structure:
 {context}
 
 Generate a natural, conversational script for this beat:
@@ -31,27 +34,170 @@ Description: {beat_description}
 
 Keep it concise and natural, as if speaking to an audience."""
 
-        # Initialize OpenAI client
-        client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-        
-        # Generate script
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a comedy writer helping create natural, conversational scripts for standup comedy bits."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.7
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def generate_script(beat_type: str, beat_description: str, previous_beats: List[Dict],
+                    client=None) -> Tuple[str, Dict]:
+    """Generate one beat's script; returns the script and its token usage."""
+    # Reuse the instance's OpenAI client
+    client = client or get_openai_client()
+
+    # Scripts are sampled, so asking again (the app's regenerate) must reach the model
+    content, usage = cached_chat_completion_with_usage(
+        client,
+        model="gpt-4o-mini",
+        messages=build_beat_messages(beat_type, beat_description, previous_beats),
+        use_cache=False,
+        max_tokens=200,
+        temperature=0.7
+    )
+    return content.strip(), usage
+
+def stream_script(beat_type: str, beat_description: str, previous_beats: List[Dict],
+                  client=None) -> Iterator[Dict]:
+    """
+    Stream one beat's script: {'delta': text} per token, then a final event with the script,
+    token usage, time to first token and total latency.
+    """
+    client = client or get_openai_client()
+    start = time.perf_counter()
+    first_token = None
+    for event in stream_chat_completion(
+        client,
+        model="gpt-4o-mini",
+        messages=build_beat_messages(beat_type, beat_description, previous_beats),
+        use_cache=False,
+        max_tokens=200,
+        temperature=0.7
+    ):
+        if 'delta' in event:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            yield event
+        else:
+            yield {
+                'script': event['content'].strip(),
+                'usage': event['usage'],
+                'timeToFirstTokenMs': round((first_token or 0) * 1000),
+                'latencyMs': round((time.perf_counter() - start) * 1000),
+            }
+
+def format_sse(event: str, data: Dict) -> str:
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def iter_timeline_scripts(timeline: List[Dict], client=None,
+                          max_workers: int = BATCH_MAX_WORKERS) -> Iterator[Dict]:
+    """
+    Generate scripts for every beat of a timeline, yielding each result as soon as it is ready.
+    A beat's context is the type and description of the beats before it, not their scripts,
+    so all beats are independent and run concurrently (at most max_workers at a time).
+    Each beat's context is capped at the MAX_CONTEXT_BEATS beats before it.
+    """
+    client = client or get_openai_client()
+
+    def run(index: int) -> Dict:
+        beat = timeline[index]
+        start = time.perf_counter()
+        script, usage = generate_script(beat.get('type'), beat.get('description'),
+                                        timeline[max(index - MAX_CONTEXT_BEATS, 0):index], client)
+        return {'index': index, 'type': beat.get('type'), 'script': script,
+                'latencyMs': round((time.perf_counter() - start) * 1000), **usage}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(timeline)))) as executor:
+        futures = {executor.submit(run, index): index for index in range(len(timeline))}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                logger.error(f"Error generating script for beat {futures[future]}: {str(e)}")
+                yield {'index': futures[future], 'type': timeline[futures[future]].get('type'), 'error': str(e)}
+
+def summarize_scripts(results: List[Dict], wall_seconds: float) -> Dict:
+    """Totals for a batch: tokens, cache hits, failures and the slowest beat."""
+    succeeded = [result for result in results if 'error' not in result]
+    return {
+        'beats': len(results),
+        'failed': len(results) - len(succeeded),
+        'cached': sum(result['cached'] for result in succeeded),
+        'promptTokens': sum(result['promptTokens'] for result in succeeded),
+        'completionTokens': sum(result['completionTokens'] for result in succeeded),
+        'maxLatencyMs': max((result['latencyMs'] for result in succeeded), default=0),
+        'wallMs': round(wall_seconds * 1000),
+    }
+
+def generate_beat_script(req: https_fn.Request) -> https_fn.Response:
+    """Generate a script for a comedy beat based on the structure context."""
+    try:
+        # Get data from request
+        data = req.data
+        generated_script, _ = generate_script(
+            data.get('beatType'),
+            data.get('description'),
+            data.get('previousBeats', [])
         )
-        
-        generated_script = response.choices[0].message.content.strip()
-        
+
         return {"script": generated_script}
-        
+
     except Exception as e:
         logger.error(f"Error generating script: {str(e)}")
         return https_fn.Response(
-            {"error": str(e)}, 
+            {"error": str(e)},
             status=500
-        ) 
\ No newline at end of file
+        )
+
+def generate_timeline_scripts(req: https_fn.CallableRequest) -> Dict:
+    """
+    Generate scripts for a whole timeline in one request.
+    Returns per-beat scripts in timeline order with token and latency accounting.
+    """
+    timeline = req.data.get('timeline', [])
+    start = time.perf_counter()
+    results = sorted(iter_timeline_scripts(timeline), key=lambda result: result['index'])
+    summary = summarize_scripts(results, time.perf_counter() - start)
+    logger.info(f"Generated {len(results)} beat scripts: {summary}")
+    return {'scripts': results, 'summary': summary}
+
+def stream_beat_script(req: https_fn.Request) -> https_fn.Response:
+    """
+    Server-sent events variant of generate_beat_script for signed-in users.
+    A body with beatType/description streams 'token' events then 'done' with the script and usage;
+    a body with a timeline streams a 'beat' event per finished beat then 'done' with the summary.
+    """
+    # Only this endpoint verifies tokens itself, so the auth module is loaded on demand
+    from firebase_admin import auth
+    header = req.headers.get('Authorization', '')
+    try:
+        auth.verify_id_token(header.split('Bearer ')[-1])
+    except Exception:
+        return https_fn.Response(json.dumps({"error": "Unauthenticated"}), status=401, mimetype='application/json')
+
+    data = req.get_json(silent=True) or {}
+    # Accept the callable wire format ({"data": {...}}) as well as a bare body
+    data = data.get('data', data)
+
+    def events() -> Iterator[str]:
+        try:
+            if 'timeline' in data:
+                start = time.perf_counter()
+                results = []
+                for result in iter_timeline_scripts(data['timeline']):
+                    results.append(result)
+                    yield format_sse('beat', result)
+                yield format_sse('done', summarize_scripts(results, time.perf_counter() - start))
+                return
+            for event in stream_script(data.get('beatType'), data.get('description'), data.get('previousBeats', [])):
+                if 'delta' in event:
+                    yield format_sse('token', {'text': event['delta']})
+                else:
+                    yield format_sse('done', event)
+        except Exception as e:
+            logger.error(f"Error streaming script: {str(e)}")
+            yield format_sse('error', {'error': str(e)})
+
+    # X-Accel-Buffering keeps proxies from holding back events until the response ends
+    return https_fn.Response(events(), mimetype='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,101 @@
+import os
+import logging
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from .tracing import record, span
+from .workspace import job_workspace
+
+# Configure logging
+logger = logging.getLogger('source_fetch')
+logger.setLevel(logging.INFO)
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB per read keeps memory flat regardless of file size
+MAX_ATTEMPTS = 4
+REQUEST_TIMEOUT = (10, 60)  # (connect, read) seconds
+
+class IncompleteDownload(Exception):
+    """Raised when the server closes the stream before sending every byte."""
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled HTTP session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+def _expected_size(response: requests.Response, offset: int) -> Optional[int]:
+    """Total object size from Content-Range (resumed) or Content-Length (full) headers."""
+    content_range = response.headers.get('Content-Range')
+    if content_range and '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        return int(total) if total.isdigit() else None
+    content_length = response.headers.get('Content-Length')
+    return offset + int(content_length) if content_length else None
+
+def _download(url: str, dest_dir: str, session: requests.Session) -> str:
+    """Stream url to a file in dest_dir, resuming with Range requests on failure."""
+    fd, part_path = tempfile.mkstemp(dir=dest_dir, suffix='.part')
+    received = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for attempt in range(MAX_ATTEMPTS):
+                headers = {'Range': f'bytes={received}-'} if received else {}
+                try:
+                    with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                        response.raise_for_status()
+                        if received and response.status_code != 206:
+                            # Server ignored the range request, start over
+                            logger.info("Server does not support range requests, restarting download")
+                            f.seek(0)
+                            f.truncate()
+                            received = 0
+                        expected = _expected_size(response, received)
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                            received += len(chunk)
+                        if expected is not None and received < expected:
+                            raise IncompleteDownload(f"Received {received} of {expected} bytes")
+                    break
+                except (requests.ConnectionError, requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError, IncompleteDownload) as e:
+                    logger.error(f"Download attempt {attempt + 1} failed at byte {received}: {str(e)}")
+                    if attempt == MAX_ATTEMPTS - 1:
+                        raise
+                    record(retries=1)
+                    time.sleep(min(2 ** attempt, 8))
+        extension = os.path.splitext(urlparse(url).path)[1]
+        source_path = os.path.join(dest_dir, 'source' + extension)
+        os.replace(part_path, source_path)
+        logger.info(f"Downloaded {received} bytes to {source_path}")
+        return source_path
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+@contextmanager
+def fetched_source(url: str, job_id: str, session: Optional[requests.Session] = None) -> Iterator[str]:
+    """
+    Download url into a private workspace for one job and yield the local file path.
+    /tmp is memory-backed on Cloud Functions and the pipeline's functions run as separate
+    services, so the file is deleted as soon as the job ends rather than cached for others.
+    """
+    with job_workspace(f"source-{job_id}") as workspace_dir:
+        logger.info(f"Downloading source from {url}")
+        with span('download'):
+            source_path = _download(url, workspace_dir, session or get_session())
+            record(bytes=os.path.getsize(source_path))
+        yield source_path
@@ -0,0 +1,97 @@
+import os
+import math
+import logging
+from typing import Dict, List
+
+# Configure logging
+logger = logging.getLogger('thumbnails')
+logger.setLevel(logging.INFO)
+
+# Written next to the first publish step's renditions so they upload with it
+THUMBNAILS_DIR = 'thumbnails'
+POSTER_WIDTH = 720
+# Poster frame time, pulled in for clips shorter than twice this
+POSTER_SECONDS = 1.0
+POSTER_FORMATS = {
+    'jpg': {'q:v': 3},
+    'webp': {'c:v': 'libwebp', 'quality': 80},
+}
+POSTER_FORMAT = os.getenv('POSTER_FORMAT', 'jpg')
+
+# One scrub thumbnail every THUMBNAIL_INTERVAL seconds, tiled into sprite sheets
+THUMBNAIL_INTERVAL = 5
+THUMBNAIL_WIDTH = 160
+THUMBNAIL_HEIGHT = 90
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+
+def plan_thumbnails(duration: float, hls_dir: str) -> Dict:
+    """Decide the poster time and sprite layout for a source of the given duration."""
+    count = max(math.ceil(duration / THUMBNAIL_INTERVAL), 1)
+    return {
+        'dir': os.path.join(hls_dir, THUMBNAILS_DIR),
+        'duration': duration,
+        'posterTime': min(POSTER_SECONDS, duration / 2),
+        'count': count,
+        'sheets': math.ceil(count / (SPRITE_COLUMNS * SPRITE_ROWS)),
+    }
+
+def sprite_name(sheet: int) -> str:
+    return f'sprite_{sheet:03d}.jpg'
+
+def thumbnail_outputs(video_stream, plan: Dict) -> List:
+    """
+    ffmpeg-python outputs for the poster frame and the sprite sheets, fed from video_stream.
+    Merged into a rendition's encode so the source is decoded once for both.
+    """
+    os.makedirs(plan['dir'], exist_ok=True)
+    poster = (
+        video_stream
+        .filter('trim', start=plan['posterTime'])
+        .filter('setpts', 'PTS-STARTPTS')
+        .filter('scale', POSTER_WIDTH, -2)
+        .output(os.path.join(plan['dir'], f'poster.{POSTER_FORMAT}'), **{'frames:v': 1},
+                **POSTER_FORMATS[POSTER_FORMAT])
+    )
+    sprites = (
+        video_stream
+        .filter('fps', fps=f'1/{THUMBNAIL_INTERVAL}')
+        .filter('scale', THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, force_original_aspect_ratio='decrease')
+        .filter('pad', THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, '(ow-iw)/2', '(oh-ih)/2')
+        .filter('tile', f'{SPRITE_COLUMNS}x{SPRITE_ROWS}')
+        .output(os.path.join(plan['dir'], 'sprite_%03d.jpg'), start_number=0, **{'q:v': 5})
+    )
+    return [poster, sprites]
+
+def format_timestamp(seconds: float) -> str:
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+def write_thumbnails_vtt(plan: Dict) -> str:
+    """Write the WebVTT track mapping each interval to its cell of a sprite sheet."""
+    per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+    lines = ['WEBVTT', '']
+    for index in range(plan['count']):
+        start = index * THUMBNAIL_INTERVAL
+        end = min(start + THUMBNAIL_INTERVAL, plan['duration'])
+        cell = index % per_sheet
+        x = (cell % SPRITE_COLUMNS) * THUMBNAIL_WIDTH
+        y = (cell // SPRITE_COLUMNS) * THUMBNAIL_HEIGHT
+        lines.append(f"{format_timestamp(start)} --> {format_timestamp(end)}")
+        lines.append(f"{sprite_name(index // per_sheet)}#xywh={x},{y},{THUMBNAIL_WIDTH},{THUMBNAIL_HEIGHT}")
+        lines.append('')
+    vtt_path = os.path.join(plan['dir'], 'thumbnails.vtt')
+    with open(vtt_path, 'w') as f:
+        f.write('\n'.join(lines))
+    logger.info(f"Wrote {plan['count']} thumbnail cues over {plan['sheets']} sprite sheets")
+    return vtt_path
+
+def thumbnail_urls(store, storage_path: str, plan: Dict) -> Dict:
+    """videos doc fields pointing at the uploaded poster, WebVTT track and sprite sheets."""
+    prefix = f"{storage_path}/{THUMBNAILS_DIR}"
+    return {
+        'thumbnailUrl': store.public_url(f"{prefix}/poster.{POSTER_FORMAT}"),
+        'thumbnailsVttUrl': store.public_url(f"{prefix}/thumbnails.vtt"),
+        'thumbnailSpriteUrls': [store.public_url(f"{prefix}/{sprite_name(sheet)}") for sheet in range(plan['sheets'])],
+    }
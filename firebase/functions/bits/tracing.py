@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Attributes summed into the per-stage timing summary
+SUMMARY_COUNTERS = ('bytes', 'retries', 'cpuSeconds')
+# Spans are also appended to this JSON-lines file when set (local runs and benchmarks)
+EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH', '')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class JsonLogExporter:
+    """One JSON object per finished span on stdout, which Cloud Logging ingests as a structured entry."""
+
+    def export(self, record: Dict) -> None:
+        print(json.dumps({'severity': 'ERROR' if 'error' in record else 'INFO', 'message': f"{record['trace']} {record['name']} {record['durationMs']}ms",
+                          **record}), flush=True)
+
+class LocalExporter:
+    """Keeps finished spans in memory and optionally appends them to a JSON-lines file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def export(self, record: Dict) -> None:
+        with self.lock:
+            self.spans.append(record)
+            if self.path:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+
+def default_exporters() -> List:
+    exporters = [JsonLogExporter()]
+    if EXPORT_PATH:
+        exporters.append(LocalExporter(EXPORT_PATH))
+    return exporters
+
+class Span:
+    """A timed stage; numeric attributes added to it accumulate (bytes, retries, cpuSeconds)."""
+
+    def __init__(self, trace: 'Trace', name: str, parent: Optional['Span'], attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes)
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def add(self, **values) -> None:
+        with self.lock:
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self.attributes[key] = self.attributes.get(key, 0) + value
+                else:
+                    self.attributes[key] = value
+
+class Trace:
+    """Spans of one pipeline run (one bit or video), exported as they finish and summarized at the end."""
+
+    def __init__(self, name: str, exporters: Optional[List] = None, **attributes):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.attributes = attributes
+        self.exporters = default_exporters() if exporters is None else exporters
+        self.start = time.perf_counter()
+        self.records = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time a stage as a child of the current span; exceptions are recorded and re-raised."""
+        parent = _current_span.get()
+        span = Span(self, name, parent if parent is not None and parent.trace is self else None, attributes)
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span, error)
+
+    def _finish(self, span: Span, error: Optional[str]) -> None:
+        record = {
+            'trace': self.name,
+            'traceId': self.trace_id,
+            'name': span.name,
+            'parent': span.parent.name if span.parent else None,
+            'startMs': round((span.start - self.start) * 1000, 1),
+            'durationMs': round((time.perf_counter() - span.start) * 1000, 1),
+            **self.attributes,
+            **span.attributes,
+        }
+        if error:
+            record['error'] = error
+        with self.lock:
+            self.records.append(record)
+        for exporter in self.exporters:
+            exporter.export(record)
+
+    def summary(self) -> Dict:
+        """Compact per-stage totals for a Firestore field: {stage: {ms, bytes, retries, cpuMs}, totalMs}."""
+        stages = {}
+        with self.lock:
+            records = list(self.records)
+        for record in records:
+            stage = stages.setdefault(record['name'], {'ms': 0})
+            stage['ms'] += record['durationMs']
+            for counter in SUMMARY_COUNTERS:
+                if record.get(counter):
+                    key = 'cpuMs' if counter == 'cpuSeconds' else counter
+                    value = record[counter] * 1000 if counter == 'cpuSeconds' else record[counter]
+                    stage[key] = stage.get(key, 0) + value
+        for stage in stages.values():
+            for key in ('ms', 'cpuMs'):
+                if key in stage:
+                    stage[key] = round(stage[key])
+        return {'stages': stages, 'totalMs': round((time.perf_counter() - self.start) * 1000)}
+
+class _NoopSpan:
+    def add(self, **values) -> None:
+        pass
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a stage under the current trace; does nothing when code runs outside a trace."""
+    current = _current_span.get()
+    if current is None:
+        yield _NoopSpan()
+        return
+    with current.trace.span(name, **attributes) as child:
+        yield child
+
+def record(**values) -> None:
+    """Add bytes, retries or other attributes to the current span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.add(**values)
+
+def wrap_context(fn):
+    """Bind fn to the caller's trace context so spans it opens on a worker thread nest correctly."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def wait_with_usage(process) -> Tuple[int, float]:
+    """
+    Reap a subprocess and return (exit code, CPU seconds it used).
+    os.wait4 reports the child's own rusage, so concurrent ffmpeg runs are not mixed up.
+    The CPU time is also added to the current span.
+    """
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    cpu_seconds = usage.ru_utime + usage.ru_stime
+    record(cpuSeconds=cpu_seconds)
+    return process.returncode, cpu_seconds
+
+def communicate_with_usage(process) -> Tuple[bytes, bytes, int, float]:
+    """Read a subprocess's stdout and stderr to the end, then reap it with wait_with_usage."""
+    results = {}
+
+    def drain(name, pipe):
+        results[name] = pipe.read() if pipe else b''
+
+    readers = [threading.Thread(target=drain, args=(name, pipe))
+               for name, pipe in (('out', process.stdout), ('err', process.stderr))]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    returncode, cpu_seconds = wait_with_usage(process)
+    return results['out'], results['err'], returncode, cpu_seconds
@@ -0,0 +1,165 @@
+import re
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import ffmpeg
+from .audio_extract import extract_audio
+from .tracing import communicate_with_usage, record, span, wrap_context
+
+# Configure logging
+logger = logging.getLogger('transcription')
+logger.setLevel(logging.INFO)
+
+# Recordings up to this long go to Whisper in one request
+MAX_CHUNK_SECONDS = 300.0
+# Each chunk starts this much before the previous one ends so no word is cut in half
+OVERLAP_SECONDS = 2.0
+# Look this far back from a chunk's maximum end for a silence to cut on
+SILENCE_SEARCH_SECONDS = 60.0
+MAX_WORKERS = 4
+
+SILENCE_NOISE = '-30dB'
+SILENCE_MIN_SECONDS = 0.4
+
+_SILENCE_START = re.compile(r'silence_start: (-?[\d.]+)')
+_SILENCE_END = re.compile(r'silence_end: (-?[\d.]+)')
+
+def detect_silences(video_path: str) -> List[Tuple[float, float]]:
+    """Return (start, end) silent ranges in the audio track using ffmpeg's silencedetect."""
+    args = (
+        ffmpeg
+        .input(video_path)
+        .audio
+        .filter('silencedetect', noise=SILENCE_NOISE, d=SILENCE_MIN_SECONDS)
+        .output('-', f='null')
+        .compile()
+    )
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err, returncode, _ = communicate_with_usage(process)
+    if returncode != 0:
+        raise ffmpeg.Error('ffmpeg', out, err)
+    output = err.decode(errors='ignore')
+    starts = [float(value) for value in _SILENCE_START.findall(output)]
+    ends = [float(value) for value in _SILENCE_END.findall(output)]
+    return list(zip(starts, ends))
+
+def plan_audio_chunks(duration: float, silences: List[Tuple[float, float]],
+                      max_seconds: float = MAX_CHUNK_SECONDS,
+                      overlap: float = OVERLAP_SECONDS) -> List[Tuple[float, float]]:
+    """
+    Split [0, duration) into (start, end) chunks of at most max_seconds.
+    Each cut is placed in the middle of the latest silence before the limit (or at the limit
+    when there is none) and the next chunk starts `overlap` seconds earlier.
+    """
+    if duration <= max_seconds:
+        return [(0.0, duration)]
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+    chunks = []
+    start = 0.0
+    while duration - start > max_seconds:
+        limit = start + max_seconds
+        candidates = [m for m in midpoints if limit - SILENCE_SEARCH_SECONDS <= m <= limit and m > start + overlap]
+        cut = candidates[-1] if candidates else limit
+        chunks.append((start, cut))
+        start = cut - overlap
+    chunks.append((start, duration))
+    return chunks
+
+def to_dict(response) -> Dict:
+    """Transcription responses are SDK objects; stub clients may return plain dicts."""
+    return response.to_dict() if hasattr(response, 'to_dict') else dict(response)
+
+def transcribe_chunk(client, video_path: str, start: float, end: float, workspace_dir: Optional[str] = None) -> Dict:
+    """Send one audio range to Whisper and return its verbose_json result."""
+    audio_file, audio_name, stats = extract_audio(video_path, start_time=start, duration=end - start,
+                                                  workspace_dir=workspace_dir)
+    logger.info(f"Transcribing {start:.1f}-{end:.1f}s ({stats['bytes']} bytes)")
+    with audio_file, span('whisper', start=start, end=end):
+        record(bytes=stats['bytes'])
+        response = client.audio.transcriptions.create(
+            file=(audio_name, audio_file),
+            model="whisper-1",
+            response_format="verbose_json",
+            timestamp_granularities=["word"]
+        )
+    return to_dict(response)
+
+def locate_words(text: str, words: List[Dict]) -> Optional[List[Tuple[int, int]]]:
+    """(start, end) offsets of each word token in text, or None if a token can't be found in order."""
+    lowered = text.lower()
+    positions = []
+    cursor = 0
+    for word in words:
+        token = word['word'].strip().lower()
+        index = lowered.find(token, cursor) if token else -1
+        if index < 0:
+            return None
+        positions.append((index, index + len(token)))
+        cursor = index + len(token)
+    return positions
+
+def kept_text(text: str, words: List[Dict], first: int, last: int) -> str:
+    """
+    The part of a chunk's punctuated text covering words[first:last + 1], including punctuation
+    attached to those words; falls back to the bare tokens when the words can't be located.
+    """
+    positions = locate_words(text, words)
+    if positions is None:
+        return ' '.join(word['word'].strip() for word in words[first:last + 1])
+    start, end = positions[first][0], positions[last][1]
+    while start > 0 and not text[start - 1].isspace():
+        start -= 1
+    while end < len(text) and not text[end].isspace():
+        end += 1
+    return text[start:end]
+
+def merge_transcripts(chunks: List[Tuple[float, float]], results: List[Dict]) -> Dict:
+    """
+    Merge per-chunk results into one {'text', 'words', 'language'} transcript.
+    Word timestamps are shifted by their chunk's start; inside each overlap the earlier
+    chunk keeps words that start before the overlap's midpoint and the later chunk the rest.
+    The text is each chunk's own (punctuated, cased) text trimmed to the words it keeps.
+    """
+    if len(results) == 1:
+        data = results[0]
+        return {'text': data['text'], 'words': data.get('words', []), 'language': data.get('language', 'en')}
+
+    words = []
+    texts = []
+    for index, ((start, end), data) in enumerate(zip(chunks, results)):
+        keep_from = (start + chunks[index - 1][1]) / 2 if index > 0 else float('-inf')
+        keep_until = (chunks[index + 1][0] + end) / 2 if index < len(chunks) - 1 else float('inf')
+        chunk_words = data.get('words', [])
+        kept = [i for i, word in enumerate(chunk_words) if keep_from <= word['start'] + start < keep_until]
+        for i in kept:
+            word = chunk_words[i]
+            words.append(dict(word, start=word['start'] + start, end=word['end'] + start))
+        if kept:
+            texts.append(kept_text(data.get('text', ''), chunk_words, kept[0], kept[-1]))
+    return {
+        'text': ' '.join(texts),
+        'words': words,
+        'language': results[0].get('language', 'en'),
+    }
+
+def transcribe_video(client, video_path: str, max_workers: int = MAX_WORKERS,
+                     max_seconds: float = MAX_CHUNK_SECONDS, workspace_dir: Optional[str] = None) -> Dict:
+    """
+    Transcribe the audio of video_path with word timestamps.
+    Long recordings are split on silences and the chunks are transcribed concurrently;
+    chunk audio that spills to disk goes into workspace_dir.
+    """
+    with span('probe'):
+        duration = float(ffmpeg.probe(video_path)['format']['duration'])
+    if duration > max_seconds:
+        with span('silences'):
+            silences = detect_silences(video_path)
+    else:
+        silences = []
+    chunks = plan_audio_chunks(duration, silences, max_seconds)
+    logger.info(f"Transcribing {duration:.1f}s of audio in {len(chunks)} chunks")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(wrap_context(transcribe_chunk), client, video_path, start, end, workspace_dir) for start, end in chunks]
+        results = [future.result() for future in futures]
+    return merge_transcripts(chunks, results)
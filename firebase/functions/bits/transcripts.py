@@ -1,14 +1,16 @@
 from firebase_functions import firestore_fn
-from firebase_admin import firestore
-from openai import OpenAI
-import os
-import requests
-from moviepy.editor import VideoFileClip
-from datetime import datetime
 from typing import Dict, List, Optional
-from .comedy_structure import analyze_joke_transcript
-from firebase_functions.https_fn import CallableRequest
-from firebase_functions import options
+from .comedy_structure import create_comedy_structure
+from .source_fetch import fetched_source
+from .transcription import transcribe_video
+from .workspace import job_workspace
+from .clients import get_firestore_client, get_openai_client
+from .leases import claim_lease
+from .videos import find_video_doc
+from .tracing import Trace, span
+
+# Disk reserved per transcript job for audio chunks that spill out of memory
+TRANSCRIPT_WORKSPACE_BYTES = 64 * 1024 * 1024
 
 def generate_transcript(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
     """Generate transcript when a new bit is created in Firestore."""
@@ -22,86 +24,79 @@ def generate_transcript(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]
     if not video_url:
         print("No video URL found in bit")
         return
-        
+    
+    # Events are delivered at least once; only the event holding the lease transcribes.
+    # The lease lives on the video document, or on the bit for bits without one.
+    db = get_firestore_client()
+    video_doc = find_video_doc(db, bit_data)
+    lease_ref = video_doc.reference if video_doc else event.data.reference
+    lease = claim_lease(db, lease_ref, 'transcript', event.id)
+    if lease is None:
+        return
+    
+    # Timing summary of every stage lands on the bit as timings.transcript
+    trace = Trace('transcript', bitId=event.data.id, eventId=event.id)
     try:
-        print(f"Downloading video from URL: {video_url}")
-        # Download video data from URL
-        response = requests.get(video_url)
-        response.raise_for_status()  # Raise an error for bad status codes
-        
-        # Save video data to a temporary file
-        video_path = "/tmp/video.mp4"
-        audio_path = "/tmp/audio.mp3"
-        with open(video_path, "wb") as f:
-            f.write(response.content)
-        
-        # Convert video to audio
-        print("Converting video to audio")
-        video = VideoFileClip(video_path)
-        video.audio.write_audiofile(audio_path)
-        video.close()
-        
-        # Open the audio file for streaming to OpenAI
-        with open(audio_path, "rb") as audio_file:
-            # Generate transcript using OpenAI Whisper
-            print("Initializing OpenAI client")
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            
-            print("Sending to OpenAI for transcription")
-            transcript_response = client.audio.transcriptions.create(
-                file=audio_file,
-                model="whisper-1",
-                response_format="verbose_json",
-                timestamp_granularities=["word"]
-            )
-        
-        # Extract transcript with timestamps
-        print("Processing transcript response")
-        transcript_data = transcript_response.to_dict()
-        
-        # Format the transcript data with word-level timestamps
-        words = transcript_data['words']
-        for word in words:
-            word['start'] = round(word['start'], 2)
-            word['end'] = round(word['end'], 2)
+        with trace.span('transcript'):
+            run_transcript(event, bit_data, video_url)
+        event.data.reference.update({'timings.transcript': trace.summary()})
+        lease.complete()
             
-        formatted_transcript = {
-            'text': transcript_data['text'],
-            'words': words,
-            'language': transcript_data.get('language', 'en')
-        }
+    except Exception as e:
+        print(f"Error generating transcript: {str(e)}")
+        event.data.reference.update({'timings.transcript': trace.summary()})
+        lease.release(str(e))
+        raise  # Re-raise the exception to ensure Cloud Functions marks this as failed
+
+def run_transcript(event: firestore_fn.Event[firestore_fn.DocumentSnapshot], bit_data: Dict, video_url: str) -> None:
+    """Transcribe the bit's video, save the transcript and analyze its comedy structure."""
+    # Generate transcript using OpenAI Whisper
+    print("Initializing OpenAI client")
+    client = get_openai_client()
+    
+    # Long sets are split on silences and transcribed concurrently
+    print(f"Fetching video from URL: {video_url}")
+    print("Sending to OpenAI for transcription")
+    # The source is kept only for this job; chunk audio that spills out of memory goes to the workspace
+    with fetched_source(video_url, f"transcript-{event.data.id}") as video_path, \
+            job_workspace(f"transcript-{event.data.id}", TRANSCRIPT_WORKSPACE_BYTES) as workspace_dir:
+        transcript_data = transcribe_video(client, video_path, workspace_dir=workspace_dir)
+    
+    # Format the transcript data with word-level timestamps
+    print("Processing transcript response")
+    words = transcript_data['words']
+    for word in words:
+        word['start'] = round(word['start'], 2)
+        word['end'] = round(word['end'], 2)
         
-        # Update the bit document with the transcript
-        print(f"Updating bit document {event.data.id} with transcript")
+    formatted_transcript = {
+        'text': transcript_data['text'],
+        'words': words,
+        'language': transcript_data.get('language', 'en')
+    }
+    
+    # Update the bit document with the transcript
+    print(f"Updating bit document {event.data.id} with transcript")
+    with span('firestore'):
         event.data.reference.update({
             'transcript': formatted_transcript
         })
 
-        # Clean up temporary files
-        os.remove(video_path)
-        os.remove(audio_path)
+    # After transcript is generated, run the comedy structure stage in-process
+    try:
+        print("Analyzing comedy structure from transcript")
+        with span('structure'):
+            result = create_comedy_structure(
+                formatted_transcript['text'],
+                formatted_transcript['words'],
+                bit_data.get('userId'),
+                client
+            )
+        print(f"Comedy structure generated with ID: {result['id']}")
+        # Lets reaction triggers find the structure whose metrics the bit's reactions feed
+        event.data.reference.update({'analyzedStructureId': result['id']})
         
-        # After transcript is generated, call the analyze_joke_transcript API
-        try:
-            print("Analyzing comedy structure from transcript")
-            functions_url = "https://us-central1-jocus-6c88f.cloudfunctions.net/analyze_joke_transcript"
-            request_data = {
-                'data': {
-                    'transcript': formatted_transcript['text'],
-                    'userId': bit_data.get('userId'),
-                    'wordTimings': formatted_transcript['words']
-                }
-            }
-            print(f"Sending request with data: {request_data}")
-            response = requests.post(functions_url, json=request_data)
-            response.raise_for_status()
-            print(f"Comedy structure generated with ID: {response.json()['id']}")
-            
-        except Exception as e:
-            print(f"Error analyzing comedy structure: {str(e)}")
-            # Don't raise the error - we don't want to fail the transcript generation
-            # if comedy structure analysis fails
-            
     except Exception as e:
-        print(f"Error generating transcript: {str(e)}")
-        raise  # Re-raise the exception to ensure Cloud Functions marks this as failed
+        print(f"Error analyzing comedy structure: {str(e)}")
+        # Don't raise the error - we don't want to fail the transcript generation
+        # if comedy structure analysis fails
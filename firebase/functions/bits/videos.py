@@ -0,0 +1,57 @@
+import hashlib
+import logging
+from typing import Dict, Optional
+from urllib.parse import unquote, urlparse
+
+# Configure logging
+logger = logging.getLogger('videos')
+logger.setLevel(logging.INFO)
+
+def object_path_from_url(video_url: str) -> Optional[str]:
+    """
+    Storage object path of an upload, from a Firebase download URL
+    (.../v0/b/<bucket>/o/<encoded path>?alt=media&token=...), a gs:// URL
+    or a storage.googleapis.com URL. The download token is ignored.
+    """
+    parsed = urlparse(video_url)
+    if parsed.scheme == 'gs':
+        return parsed.path.lstrip('/') or None
+    if '/o/' in parsed.path:
+        return unquote(parsed.path.split('/o/', 1)[1]) or None
+    if parsed.netloc == 'storage.googleapis.com':
+        # /<bucket>/<path>
+        parts = unquote(parsed.path).lstrip('/').split('/', 1)
+        return parts[1] if len(parts) == 2 else None
+    return None
+
+def video_id_for_path(object_path: str) -> str:
+    """
+    Deterministic videos document ID for a storage object path: the hex SHA-256 of the path.
+    The ID also names the video's HLS folder, so it must be URL-safe
+    (the app computes the same with sha256 from package:crypto).
+    """
+    return hashlib.sha256(object_path.encode('utf-8')).hexdigest()
+
+def video_id_for_url(video_url: str) -> Optional[str]:
+    object_path = object_path_from_url(video_url)
+    return video_id_for_path(object_path) if object_path else None
+
+def find_video_doc(db, bit_data: Dict) -> Optional[object]:
+    """
+    Return the videos document snapshot for a bit, or None.
+    Uses the bit's videoId, then the ID derived from its storage path, each a single get;
+    the storageUrl equality query remains only for documents the backfill hasn't reached.
+    """
+    videos = db.collection('videos')
+    video_url = bit_data.get('storageUrl', '')
+    for video_id in (bit_data.get('videoId'), video_id_for_url(video_url)):
+        if video_id:
+            video_doc = videos.document(video_id).get()
+            if video_doc.exists:
+                return video_doc
+
+    video_docs = videos.where('storageUrl', '==', video_url).limit(1).get()
+    if video_docs:
+        logger.warning(f"Found video {video_docs[0].id} by storageUrl query; run backfill_video_ids.py")
+        return video_docs[0]
+    return None
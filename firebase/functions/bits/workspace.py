@@ -0,0 +1,72 @@
+import os
+import re
+import shutil
+import logging
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# Configure logging
+logger = logging.getLogger('workspace')
+logger.setLevel(logging.INFO)
+
+WORKSPACE_ROOT = os.path.join(tempfile.gettempdir(), 'jobs')
+# Always leave this much free in /tmp for ffmpeg scratch files
+DISK_HEADROOM_BYTES = 64 * 1024 * 1024
+# How long a job waits for other jobs on the instance to release disk before failing
+BUDGET_WAIT_SECONDS = 120
+
+class WorkspaceBudgetExceeded(Exception):
+    """Raised when a job's disk reservation cannot fit on this instance."""
+
+_reserved_bytes = 0
+_budget = threading.Condition()
+
+def _free_bytes() -> int:
+    os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+    return shutil.disk_usage(WORKSPACE_ROOT).free
+
+def _reserve(job_id: str, required_bytes: int, wait_seconds: float) -> None:
+    """Reserve required_bytes of /tmp for a job, waiting for other jobs to release space."""
+    global _reserved_bytes
+    deadline = time.monotonic() + wait_seconds
+    with _budget:
+        while _free_bytes() - _reserved_bytes - DISK_HEADROOM_BYTES < required_bytes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise WorkspaceBudgetExceeded(
+                    f"Job {job_id} needs {required_bytes} bytes, "
+                    f"{_free_bytes() - _reserved_bytes} free after other jobs' reservations"
+                )
+            logger.info(f"Job {job_id} waiting for {required_bytes} bytes of workspace")
+            _budget.wait(remaining)
+        _reserved_bytes += required_bytes
+
+def _release(required_bytes: int) -> None:
+    global _reserved_bytes
+    with _budget:
+        _reserved_bytes -= required_bytes
+        _budget.notify_all()
+
+@contextmanager
+def job_workspace(job_id: str, required_bytes: int = 0, wait_seconds: float = BUDGET_WAIT_SECONDS) -> Iterator[str]:
+    """
+    Yield a private scratch directory for one job and delete it afterwards, even on errors.
+    required_bytes is reserved against the instance's free /tmp space so concurrent jobs
+    cannot fill the (memory-backed) disk; see WorkspaceBudgetExceeded.
+    """
+    _reserve(job_id, required_bytes, wait_seconds)
+    try:
+        os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+        safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', job_id)[:64]
+        path = tempfile.mkdtemp(prefix=f'{safe_id}-', dir=WORKSPACE_ROOT)
+        logger.info(f"Created workspace {path} ({required_bytes} bytes reserved)")
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Cleaned up workspace {path}")
+    finally:
+        _release(required_bytes)
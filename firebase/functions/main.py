@@ -1,8 +1,6 @@
-import os
 import logging
-from firebase_functions import firestore_fn
-from firebase_admin import initialize_app, storage, firestore
-from openai import OpenAI
+from firebase_functions import firestore_fn, https_fn, scheduler_fn
+from firebase_admin import initialize_app
 from firebase_functions import options
 
 # Configure logging first
@@ -13,26 +11,68 @@ logger.setLevel(logging.INFO)
 # Initialize Firebase
 initialize_app()
 
-# Import function implementations
-from bits.transcripts import generate_transcript
-from bits.comedy_structure import analyze_joke_transcript
-from bits.hls_transcoder import on_bit_created
-from bits.script_generator import generate_beat_script
-
 # Log that functions are being registered
 logger.info("Registering cloud functions...")
 
 # Export functions
-generate_transcript = firestore_fn.on_document_created(
-    document="bits/{bitId}"
-)(generate_transcript)
+# Each handler module is imported on the function's first invocation, so an instance only loads
+# the stack it runs (generate_beat_script never imports ffmpeg or the transcription pipeline).
+# Python caches the import, so warm invocations pay nothing extra.
+
+# Jobs use private workspaces (bits/workspace.py), so instances can take concurrent events.
+# Each job's source download lives in its workspace and is deleted when the job ends.
+@firestore_fn.on_document_created(
+    document="bits/{bitId}",
+    cpu=1,
+    concurrency=4
+)
+def generate_transcript(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    from bits.transcripts import generate_transcript as handler
+    return handler(event)
 
-on_bit_created = firestore_fn.on_document_created(
+@firestore_fn.on_document_created(
     document="bits/{bitId}",
-    memory=options.MemoryOption.GB_1,
+    memory=options.MemoryOption.GB_2,
+    cpu=2,
+    concurrency=2,
     timeout_sec=540
-)(on_bit_created)
+)
+def on_bit_created(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    from bits.hls_transcoder import on_bit_created as handler
+    return handler(event)
+
+@firestore_fn.on_document_created(document="bits/{bitId}/reactions/{reactionId}")
+def on_reaction_created(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    from bits.reaction_histogram import on_reaction_created as handler
+    return handler(event)
+
+@firestore_fn.on_document_deleted(document="bits/{bitId}/reactions/{reactionId}")
+def on_reaction_deleted(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    from bits.reaction_histogram import on_reaction_deleted as handler
+    return handler(event)
+
+# Rolls up histograms whose last reactions were throttled, since no later reaction will
+@scheduler_fn.on_schedule(schedule="every 1 minutes")
+def sweep_pending_histograms(event: scheduler_fn.ScheduledEvent) -> None:
+    from bits.reaction_histogram import sweep_pending_histograms as handler
+    return handler(event)
+
+@https_fn.on_call()
+def analyze_joke_transcript(req: https_fn.CallableRequest):
+    from bits.comedy_structure import analyze_joke_transcript as handler
+    return handler(req)
+
+@https_fn.on_call()
+def generate_beat_script(req: https_fn.CallableRequest):
+    from bits.script_generator import generate_beat_script as handler
+    return handler(req)
 
-analyze_joke_transcript = analyze_joke_transcript
+@https_fn.on_call()
+def generate_timeline_scripts(req: https_fn.CallableRequest):
+    from bits.script_generator import generate_timeline_scripts as handler
+    return handler(req)
 
-generate_beat_script = generate_beat_script
+@https_fn.on_request(cors=options.CorsOptions(cors_origins="*", cors_methods=["post"]))
+def stream_beat_script(req: https_fn.Request) -> https_fn.Response:
+    from bits.script_generator import stream_beat_script as handler
+    return handler(req)
@@ -1,14 +1,14 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+import argparse
+import json
 import random
+import threading
+import time
 from datetime import datetime, timedelta
 import os
 
-# Initialize Firebase Admin
-cred = credentials.Certificate(os.path.join(os.path.dirname(__file__), '..', 'service-account-key.json'))
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-
 # Reaction types and their probabilities (out of 100)
 REACTION_TYPES = {
     'rofl': 40,    # Most common
@@ -17,20 +17,24 @@ REACTION_TYPES = {
     'vomit': 10    # Rare
 }
 
-def generate_random_reactions(bit_id, num_reactions=50):
+# Bits whose writes are flushed together before they are recorded in the checkpoint
+CHECKPOINT_EVERY = 100
+# Retries per failed write before BulkWriter gives up on it
+MAX_WRITE_ATTEMPTS = 5
+
+def generate_random_reactions(rng, num_reactions, base_time):
     """Generate random reactions for a bit."""
     reactions = []
-    base_time = datetime.now() - timedelta(days=7)  # Spread over last week
-    
+
     for _ in range(num_reactions):
-        # Random timestamp within the last week
+        # Random timestamp within the week after base_time
         timestamp = base_time + timedelta(
-            days=random.random() * 7,
-            seconds=random.randint(0, 86400)
+            days=rng.random() * 7,
+            seconds=rng.randint(0, 86400)
         )
-        
+
         # Random reaction type based on probabilities
-        rand = random.randint(1, 100)
+        rand = rng.randint(1, 100)
         cumulative = 0
         selected_type = None
         for reaction_type, probability in REACTION_TYPES.items():
@@ -38,65 +42,158 @@ def generate_random_reactions(bit_id, num_reactions=50):
             if rand <= cumulative:
                 selected_type = reaction_type
                 break
-        
+
         # Random timestamp in the video (0 to 1 minutes)
-        video_timestamp = random.uniform(0, 60)
-        
+        video_timestamp = rng.uniform(0, 60)
+
         reactions.append({
             'type': selected_type,
             'timestamp': video_timestamp,
-            'userId': f'random_user_{random.randint(1, 100)}',
+            'userId': f'random_user_{rng.randint(1, 100)}',
             'createdAt': timestamp
         })
-    
+
     return reactions
 
-def update_bit_analytics(bit_ref, reactions):
-    """Update analytics for a bit based on reactions."""
+def get_bit_analytics(rng, reactions):
+    """Analytics stats doc for a bit based on its reactions."""
     reaction_counts = {reaction_type: 0 for reaction_type in REACTION_TYPES}
     for reaction in reactions:
         reaction_counts[reaction['type']] += 1
-    
-    analytics_ref = bit_ref.collection('analytics').document('stats')
-    analytics_ref.set({
+
+    return {
         'totalReactions': len(reactions),
         'reactionCounts': reaction_counts,
-        'viewCount': random.randint(len(reactions) * 2, len(reactions) * 10),  # Views are 2-10x reactions
-        'lastUpdated': datetime.now()
-    })
+        'viewCount': rng.randint(len(reactions) * 2, len(reactions) * 10),  # Views are 2-10x reactions
+        'lastUpdated': firestore.SERVER_TIMESTAMP
+    }
+
+class Checkpoint:
+    """Bit IDs already seeded, persisted to a JSON file so an interrupted run can resume."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.done = set(json.load(f)['done'])
 
-def add_reactions_to_bits(min_reactions=30, max_reactions=100):
+    def record(self, bit_ids):
+        self.done.update(bit_ids)
+        if not self.path:
+            return
+        # Write then rename so a crash never leaves a truncated checkpoint
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'done': sorted(self.done)}, f)
+        os.replace(temp_path, self.path)
+
+class ReactionLoader:
+    """
+    Seeds bits through one rate-limited BulkWriter.
+    Generating a bit's reactions is cheap next to writing them, and BulkWriter sends its batches
+    in parallel on its own threads, so bits are queued from a single thread.
+    """
+
+    def __init__(self, db, seed, base_time, min_reactions, max_reactions, initial_rate, max_rate):
+        self.db = db
+        self.seed = seed
+        self.base_time = base_time
+        self.min_reactions = min_reactions
+        self.max_reactions = max_reactions
+        # BulkWriter ramps from initial_rate by 50% every 5 minutes up to max_rate (500/50/5)
+        self.writer = db.bulk_writer(BulkWriterOptions(initial_ops_per_second=initial_rate,
+                                                       max_ops_per_second=max_rate))
+        self.writer.on_write_result(self._on_write_result)
+        self.writer.on_write_error(self._on_write_error)
+        # Callbacks run on BulkWriter's threads
+        self.stats_lock = threading.Lock()
+        self.stats = {'written': 0, 'failed': 0}
+        # Bits with a write BulkWriter gave up on, left out of the checkpoint so a re-run retries them
+        self.failed_bits = set()
+
+    def _on_write_result(self, reference, result, writer):
+        with self.stats_lock:
+            self.stats['written'] += 1
+
+    def _on_write_error(self, failure, writer):
+        if failure.attempts < MAX_WRITE_ATTEMPTS:
+            return True
+        with self.stats_lock:
+            self.stats['failed'] += 1
+            self.failed_bits.add(failure.operation.reference.parent.parent.id)
+        print(f"Giving up on {failure.operation.reference.path}: {failure.message}")
+        return False
+
+    def seed_bit(self, bit_ref):
+        """Queue a bit's reactions and analytics; returns the number of documents queued."""
+        # Per-bit generator, so a bit's dataset doesn't depend on the bit order or resumes
+        rng = random.Random(f"{self.seed}:{bit_ref.id}")
+        reactions = generate_random_reactions(
+            rng, rng.randint(self.min_reactions, self.max_reactions), self.base_time
+        )
+        analytics = get_bit_analytics(rng, reactions)
+        # Deterministic IDs make a re-run overwrite instead of duplicating
+        for i, reaction in enumerate(reactions):
+            self.writer.set(bit_ref.collection('reactions').document(f'seed{self.seed}_{i:05d}'), reaction)
+        # Merged so fields maintained by the functions (reactionHistogram) survive a re-seed
+        self.writer.set(bit_ref.collection('analytics').document('stats'), analytics, merge=True)
+        return len(reactions) + 1
+
+    def run(self, bit_refs, checkpoint):
+        pending = [bit_ref for bit_ref in bit_refs if bit_ref.id not in checkpoint.done]
+        print(f"Seeding {len(pending)} bits ({len(bit_refs) - len(pending)} already done)")
+        start = time.perf_counter()
+        queued = 0
+        for i in range(0, len(pending), CHECKPOINT_EVERY):
+            chunk = pending[i:i + CHECKPOINT_EVERY]
+            queued += sum(self.seed_bit(bit_ref) for bit_ref in chunk)
+            self.writer.flush()
+            # flush() waits out retries, so every write of the chunk has succeeded or been given up on
+            with self.stats_lock:
+                checkpoint.record(bit_ref.id for bit_ref in chunk if bit_ref.id not in self.failed_bits)
+            elapsed = time.perf_counter() - start
+            print(f"{min(i + CHECKPOINT_EVERY, len(pending))}/{len(pending)} bits, "
+                  f"{self.stats['written']} docs, {self.stats['written'] / elapsed:.0f} docs/sec")
+        self.writer.close()
+        elapsed = time.perf_counter() - start
+        print(f"Wrote {self.stats['written']} of {queued} docs in {elapsed:.1f}s "
+              f"({self.stats['written'] / max(elapsed, 1e-9):.0f} docs/sec), {self.stats['failed']} failed")
+        if self.failed_bits:
+            print(f"{len(self.failed_bits)} bits with failed writes were left out of the checkpoint")
+        return self.stats
+
+def add_reactions_to_bits(db, seed=0, min_reactions=30, max_reactions=100, base_time=None,
+                          initial_rate=500, max_rate=10000, checkpoint_path=None, limit=None):
     """Add random reactions to all bits in the database."""
-    bits_ref = db.collection('bits')
-    bits = bits_ref.stream()
-    
-    for bit in bits:
-        print(f"Processing bit: {bit.id}")
-        
-        # Generate random number of reactions
-        num_reactions = random.randint(min_reactions, max_reactions)
-        reactions = generate_random_reactions(bit.id, num_reactions)
-        
-        # Add reactions in batches
-        batch_size = 500
-        for i in range(0, len(reactions), batch_size):
-            batch = db.batch()
-            batch_reactions = reactions[i:i + batch_size]
-            
-            for reaction in batch_reactions:
-                reaction_ref = bit.reference.collection('reactions').document()
-                batch.set(reaction_ref, reaction)
-            
-            batch.commit()
-            print(f"Added batch of {len(batch_reactions)} reactions")
-        
-        # Update analytics
-        update_bit_analytics(bit.reference, reactions)
-        print(f"Updated analytics for bit {bit.id}")
-        print(f"Total reactions added: {len(reactions)}")
-        print("-" * 50)
+    bit_refs = list(db.collection('bits').list_documents())
+    if limit:
+        bit_refs = bit_refs[:limit]
+    loader = ReactionLoader(db, seed, base_time or datetime.now() - timedelta(days=7),
+                            min_reactions, max_reactions, initial_rate, max_rate)
+    return loader.run(bit_refs, Checkpoint(checkpoint_path))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed random reactions onto every bit")
+    parser.add_argument('--seed', type=int, default=0, help="Same seed and base date give the same dataset")
+    parser.add_argument('--base-date', type=lambda value: datetime.fromisoformat(value),
+                        help="Start of the week reactions are spread over (default: a week ago)")
+    parser.add_argument('--min-reactions', type=int, default=30)
+    parser.add_argument('--max-reactions', type=int, default=100)
+    parser.add_argument('--initial-rate', type=int, default=500, help="Writes/sec BulkWriter starts at")
+    parser.add_argument('--max-rate', type=int, default=10000, help="Writes/sec BulkWriter ramps up to")
+    parser.add_argument('--checkpoint', help="JSON file recording finished bits, to resume an interrupted run")
+    parser.add_argument('--limit', type=int, help="Only seed the first N bits")
+    args = parser.parse_args()
+
+    # Initialize Firebase Admin (the emulator needs no credentials)
+    if os.getenv('FIRESTORE_EMULATOR_HOST'):
+        firebase_admin.initialize_app(options={'projectId': os.getenv('GCLOUD_PROJECT', 'demo-jocus')})
+    else:
+        cred = credentials.Certificate(os.path.join(os.path.dirname(__file__), '..', 'service-account-key.json'))
+        firebase_admin.initialize_app(cred)
+
     print("Starting to add reactions to bits...")
-    add_reactions_to_bits()
+    add_reactions_to_bits(firestore.client(), args.seed, args.min_reactions, args.max_reactions, args.base_date,
+                          args.initial_rate, args.max_rate, args.checkpoint, args.limit)
     print("Finished adding reactions to bits!")
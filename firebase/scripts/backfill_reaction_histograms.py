@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+
+# Make the Cloud Functions source importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+from bits.reaction_histogram import backfill_histogram
+
+def backfill(db, bit_ids=None):
+    """Rebuild the reaction timeline histogram of the given bits, or of every bit."""
+    bits = db.collection('bits')
+    refs = [bits.document(bit_id) for bit_id in bit_ids] if bit_ids else [bit.reference for bit in bits.stream()]
+    for bit_ref in refs:
+        histogram = backfill_histogram(db, bit_ref)
+        total = sum(sum(counts) for counts in histogram.values())
+        print(f"Backfilled {bit_ref.id}: {total} reactions over "
+              f"{max((len(counts) for counts in histogram.values()), default=0)} buckets")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild bits' reaction timeline histograms from their reactions")
+    parser.add_argument('bits', nargs='*', help="Bit IDs to backfill (default: all bits)")
+    args = parser.parse_args()
+
+    # Initialize Firebase Admin
+    if os.getenv('FIRESTORE_EMULATOR_HOST'):
+        firebase_admin.initialize_app(options={'projectId': os.getenv('GCLOUD_PROJECT', 'demo-jocus')})
+    else:
+        cred = credentials.Certificate(os.path.join(os.path.dirname(__file__), '..', 'service-account-key.json'))
+        firebase_admin.initialize_app(cred)
+    backfill(firestore.client(), args.bits)
@@ -0,0 +1,71 @@
+import argparse
+import os
+import sys
+
+# Make the Cloud Functions source importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+from bits.videos import object_path_from_url
+
+# Firestore allows at most 500 writes per batch
+BATCH_SIZE = 500
+
+def build_video_index(db):
+    """Map each video's storage object path (and raw URL) to its document ID."""
+    index = {}
+    for video in db.collection('videos').stream():
+        storage_url = (video.to_dict() or {}).get('storageUrl')
+        if not storage_url:
+            continue
+        index[storage_url] = video.id
+        object_path = object_path_from_url(storage_url)
+        if object_path:
+            index[object_path] = video.id
+    return index
+
+def backfill(db, dry_run):
+    """Set videoId on every bit that lacks one, committing in batches."""
+    index = build_video_index(db)
+    print(f"Indexed {len(index)} video keys")
+
+    batch = db.batch()
+    pending = 0
+    stats = {'linked': 0, 'alreadyLinked': 0, 'unmatched': 0}
+    for bit in db.collection('bits').stream():
+        data = bit.to_dict() or {}
+        if data.get('videoId'):
+            stats['alreadyLinked'] += 1
+            continue
+        storage_url = data.get('storageUrl', '')
+        # Match on the object path first so URLs with a rotated download token still link
+        video_id = index.get(object_path_from_url(storage_url) or '') or index.get(storage_url)
+        if not video_id:
+            stats['unmatched'] += 1
+            print(f"No video for bit {bit.id} ({storage_url[:80]})")
+            continue
+        stats['linked'] += 1
+        if dry_run:
+            continue
+        batch.update(bit.reference, {'videoId': video_id})
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+    print(f"{'Would link' if dry_run else 'Linked'} {stats['linked']} bits, "
+          f"{stats['alreadyLinked']} already linked, {stats['unmatched']} without a video")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Link existing bits to their video document by ID")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+    args = parser.parse_args()
+
+    # Initialize Firebase Admin
+    cred = credentials.Certificate(os.path.join(os.path.dirname(__file__), '..', 'service-account-key.json'))
+    firebase_admin.initialize_app(cred)
+    backfill(firestore.client(), args.dry_run)
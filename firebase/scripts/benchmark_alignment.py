@@ -0,0 +1,97 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Make the Cloud Functions source importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+from bits.beat_alignment import WordIndex, align_beats
+
+COMMON_WORDS = ['the', 'a', 'and', 'i', 'you', 'so', 'like', 'was', 'my', 'it']
+
+def make_transcript(word_count, vocabulary, seed):
+    """Synthetic Whisper-style word timings with a Zipf-ish mix of common and rare words."""
+    rng = random.Random(seed)
+    words = [f'word{i}' for i in range(vocabulary)]
+    timings = []
+    for i in range(word_count):
+        word = rng.choice(COMMON_WORDS) if rng.random() < 0.4 else rng.choice(words)
+        timings.append({'word': word.capitalize() + ',' if rng.random() < 0.05 else word,
+                        'start': round(i * 0.35, 2), 'end': round(i * 0.35 + 0.3, 2)})
+    return timings
+
+def make_beats(word_timings, beat_count, beat_words, seed):
+    """Beats copied from evenly spaced transcript spans, with the odd word dropped like an LLM would."""
+    rng = random.Random(seed)
+    spacing = len(word_timings) // beat_count
+    beats = []
+    for i in range(beat_count):
+        start = i * spacing + rng.randint(0, max(spacing - beat_words, 0))
+        span = [w['word'] for w in word_timings[start:start + beat_words] if rng.random() > 0.05]
+        beats.append({'script': ' '.join(span), 'expected': (start, start + beat_words - 1)})
+    return beats
+
+def legacy_find_word_boundaries(word_timings, words):
+    """The first/last word equality scan this engine replaced."""
+    target_words = [w.lower() for w in words]
+    first_word_time = None
+    last_word_time = None
+    for i in range(len(word_timings)):
+        current_word = word_timings[i]['word'].lower()
+        if current_word == target_words[0] and first_word_time is None:
+            first_word_time = word_timings[i]['start']
+        if current_word == target_words[-1]:
+            last_word_time = word_timings[i]['end']
+    if first_word_time is None or last_word_time is None:
+        return {'start': word_timings[0]['start'], 'end': word_timings[-1]['end']}
+    return {'start': first_word_time, 'end': last_word_time}
+
+def legacy_words_between(word_timings, start_time, end_time):
+    return [w for w in word_timings if w['start'] <= end_time and w['end'] >= start_time]
+
+def is_exact(word_timings, beat, start, end):
+    first, last = beat['expected']
+    return start == word_timings[first]['start'] and end == word_timings[last]['end']
+
+def benchmark(sizes, beat_count, beat_words, seed):
+    for size in sizes:
+        word_timings = make_transcript(size, max(size // 10, 100), seed)
+        beats = make_beats(word_timings, beat_count, beat_words, seed)
+
+        start = time.perf_counter()
+        legacy = [legacy_find_word_boundaries(word_timings, beat['script'].split()) for beat in beats]
+        legacy_time = time.perf_counter() - start
+        legacy_exact = sum(is_exact(word_timings, b, r['start'], r['end']) for b, r in zip(beats, legacy))
+
+        start = time.perf_counter()
+        index = WordIndex(word_timings)
+        index_time = time.perf_counter() - start
+        start = time.perf_counter()
+        aligned = align_beats(word_timings, beats, index)
+        align_time = time.perf_counter() - start
+        exact = sum(bool(r) and is_exact(word_timings, b, r['start'], r['end']) for b, r in zip(beats, aligned))
+
+        queries = [(t, t + 5.0) for t in (w['start'] for w in word_timings[::max(size // 1000, 1)])]
+        start = time.perf_counter()
+        for query in queries:
+            legacy_words_between(word_timings, *query)
+        legacy_range_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for query in queries:
+            index.words_between(*query)
+        range_time = time.perf_counter() - start
+
+        print(f"{size:>7} words: legacy {legacy_time * 1000:8.1f}ms exact={legacy_exact}/{beat_count} | "
+              f"index {index_time * 1000:6.1f}ms + align {align_time * 1000:7.1f}ms exact={exact}/{beat_count} | "
+              f"{len(queries)} range queries legacy {legacy_range_time * 1000:8.1f}ms bisect {range_time * 1000:6.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark beat alignment on synthetic transcripts")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10000, 30000, 100000])
+    parser.add_argument('--beats', type=int, default=50)
+    parser.add_argument('--beat-words', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    benchmark(args.sizes, args.beats, args.beat_words, args.seed)
@@ -0,0 +1,57 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make the Cloud Functions source importable
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions')
+sys.path.insert(0, FUNCTIONS_DIR)
+
+from fakes import generate_clip
+from bits.audio_extract import AUDIO_FORMATS, extract_audio
+
+def measure_import(module):
+    """Import time of a module in a fresh interpreter, in seconds."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=FUNCTIONS_DIR)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip())
+
+def extract_with_moviepy(video_path, audio_path):
+    """The previous transcript path: decode with MoviePy and write an MP3."""
+    from moviepy.editor import VideoFileClip
+    video = VideoFileClip(video_path)
+    video.audio.write_audiofile(audio_path, logger=None)
+    video.close()
+    return os.path.getsize(audio_path)
+
+def benchmark(duration):
+    for module in ('moviepy.editor', 'bits.audio_extract'):
+        seconds = measure_import(module)
+        print(f"import {module:<20} " + (f"{seconds:.3f}s" if seconds is not None else "not installed"))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, 'input.mp4')
+        print(f"Generating {duration}s test clip...")
+        generate_clip(video_path, duration)
+
+        try:
+            start = time.perf_counter()
+            size = extract_with_moviepy(video_path, os.path.join(temp_dir, 'audio.mp3'))
+            print(f"{'moviepy mp3':<12} wall={time.perf_counter() - start:.2f}s bytes={size}")
+        except ImportError:
+            print("moviepy mp3  skipped (moviepy not installed)")
+
+        for audio_format in AUDIO_FORMATS:
+            audio_file, _, stats = extract_audio(video_path, audio_format)
+            audio_file.close()
+            print(f"{audio_format:<12} wall={stats['seconds']:.2f}s bytes={stats['bytes']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare MoviePy and ffmpeg-pipe audio extraction for Whisper")
+    parser.add_argument('--duration', type=int, default=300, help="Length of the synthetic clip in seconds")
+    args = parser.parse_args()
+    benchmark(args.duration)
@@ -0,0 +1,83 @@
+import argparse
+import json
+import time
+
+from fakes import ReplayChatClient
+from bits.beats_parser import BeatsStreamParser, parse_beats_response
+from bits.llm_cache import LLMCache
+
+CLEAN = json.dumps({
+    'title': 'Gym Membership Regret',
+    'description': 'Paying for motivation that never shows up',
+    'beats': [
+        {'type': 'setup', 'description': 'Sets up the new year resolution',
+         'script': 'I signed up for a gym in January', 'durationSeconds': 3},
+        {'type': 'punchline', 'description': 'Reveals the real use of the membership',
+         'script': 'now I just pay them to feel guilty', 'durationSeconds': 2},
+    ],
+}, indent=2)
+
+# Failure shapes seen from free-form chat output
+RECORDED_RESPONSES = {
+    'clean': CLEAN,
+    'fenced': f"```json\n{CLEAN}\n```",
+    'prose': f"Sure! Here is the analysis:\n{CLEAN}\nLet me know if you want changes.",
+    'trailing_comma': CLEAN.replace('"durationSeconds": 2\n', '"durationSeconds": 2,\n'),
+    'truncated': CLEAN[:CLEAN.rindex('"durationSeconds": 2')],
+    'missing_beat': CLEAN[:CLEAN.index('{\n      "type": "punchline"')],
+}
+
+def legacy_parse(content):
+    """The json.loads path get_gpt_beats used before, where any error meant no beats."""
+    try:
+        beats = json.loads(content)['beats']
+        return 'strict' if len(beats) == 2 else 'failed'
+    except Exception:
+        return 'failed'
+
+def run_get_gpt_beats(latency):
+    """Drive get_gpt_beats end to end against the replay client (needs the functions dependencies)."""
+    import bits.llm_cache as llm_cache
+    from bits.comedy_structure import get_gpt_beats
+    # Memory-only cache so no Firestore credentials are needed
+    llm_cache._default_cache = LLMCache()
+    client = ReplayChatClient(RECORDED_RESPONSES.values(), latency)
+    for name in RECORDED_RESPONSES:
+        start = time.perf_counter()
+        result = get_gpt_beats(f'transcript for {name}', [], client)
+        print(f"  get_gpt_beats[{name}]: {len(result['beats'])} beats in {(time.perf_counter() - start) * 1000:.1f}ms")
+    print(f"  {client.calls} model calls for {len(RECORDED_RESPONSES)} responses")
+
+def benchmark(iterations, latency, end_to_end):
+    print(f"{'response':>15} | {'legacy':>7} | {'tolerant':>8} | beats | parse us | stream beats")
+    totals = {'legacy': 0, 'tolerant': 0}
+    for name, content in RECORDED_RESPONSES.items():
+        legacy = legacy_parse(content)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            result, outcome = parse_beats_response(content, record=False)
+        parse_us = (time.perf_counter() - start) / iterations * 1e6
+
+        # Feed the response in small chunks as a streaming completion would arrive
+        stream = BeatsStreamParser()
+        streamed = []
+        for i in range(0, len(content), 16):
+            streamed.extend(stream.feed(content[i:i + 16]))
+
+        totals['legacy'] += legacy == 'failed'
+        totals['tolerant'] += outcome == 'failed'
+        print(f"{name:>15} | {legacy:>7} | {outcome:>8} | {len(result['beats']):>5} | {parse_us:8.1f} | {len(streamed)}")
+
+    count = len(RECORDED_RESPONSES)
+    print(f"failure rate: legacy {totals['legacy']}/{count}, tolerant {totals['tolerant']}/{count}; "
+          f"each legacy failure costs a full model round trip (~{latency:.1f}s) to retry")
+    if end_to_end:
+        run_get_gpt_beats(latency)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded beats responses through the tolerant parser")
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=1.5, help="Simulated model latency in seconds")
+    parser.add_argument('--end-to-end', action='store_true', help="Also run get_gpt_beats with the replay client")
+    args = parser.parse_args()
+    benchmark(args.iterations, args.latency, args.end_to_end)
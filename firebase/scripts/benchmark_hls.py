@@ -0,0 +1,73 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from fakes import generate_clip
+from bits.hls_ladder import default_ladder
+from bits.hls_transcoder import transcode_per_quality, transcode_segment_parallel, transcode_single_pass
+
+MODES = {
+    'per_quality': transcode_per_quality,
+    'single_pass': transcode_single_pass,
+}
+
+def get_transcoder(mode):
+    """Resolve a mode name; parallel_N runs segment-parallel encoding on N workers."""
+    if mode.startswith('parallel_'):
+        workers = int(mode[len('parallel_'):])
+        return lambda input_path, hls_dir, rungs: transcode_segment_parallel(input_path, hls_dir, rungs, workers)
+    return MODES[mode]
+
+def run_mode(mode, input_path, results):
+    """Run one transcode mode in a fresh process so child rusage only covers its ffmpeg runs."""
+    with tempfile.TemporaryDirectory() as hls_dir:
+        start = time.perf_counter()
+        # Full re-encode ladder so both modes do the same work
+        get_transcoder(mode)(input_path, hls_dir, default_ladder())
+        wall_time = time.perf_counter() - start
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    results.put({
+        'mode': mode,
+        'wall_time': wall_time,
+        'cpu_time': usage.ru_utime + usage.ru_stime,
+        'peak_rss_mb': usage.ru_maxrss / 1024,  # ru_maxrss is in KB on Linux
+    })
+
+def benchmark(duration, repeats, workers):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, 'input.mp4')
+        print(f"Generating {duration}s test clip...")
+        generate_clip(input_path, duration)
+
+        modes = list(MODES) + [f'parallel_{count}' for count in workers]
+        results = multiprocessing.Queue()
+        wall_times = {}
+        for mode in modes:
+            for _ in range(repeats):
+                process = multiprocessing.Process(target=run_mode, args=(mode, input_path, results))
+                process.start()
+                process.join()
+                if process.exitcode != 0:
+                    raise RuntimeError(f"{mode} run failed with exit code {process.exitcode}")
+                result = results.get()
+                wall_times.setdefault(mode, []).append(result['wall_time'])
+                print(f"{result['mode']:<12} wall={result['wall_time']:.2f}s "
+                      f"cpu={result['cpu_time']:.2f}s peak_rss={result['peak_rss_mb']:.1f}MB")
+
+        if workers:
+            baseline = min(wall_times[f'parallel_{workers[0]}'])
+            for count in workers:
+                print(f"parallel speedup {workers[0]} -> {count} workers: "
+                      f"{baseline / min(wall_times[f'parallel_{count}']):.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-quality, single-pass and segment-parallel HLS encoding")
+    parser.add_argument('--duration', type=int, default=60, help="Length of the synthetic clip in seconds")
+    parser.add_argument('--repeats', type=int, default=1, help="Runs per mode")
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, os.cpu_count() or 1],
+                        help="Worker counts to run segment-parallel mode with")
+    args = parser.parse_args()
+    benchmark(args.duration, args.repeats, sorted(set(args.workers)))
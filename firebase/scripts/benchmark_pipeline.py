@@ -0,0 +1,204 @@
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import traceback
+from types import SimpleNamespace
+
+from fakes import (FileBucket, MemoryFirestore, StubOpenAI, generate_clip, install_fakes,
+                   make_word_timings, serve_directory)
+
+CASES = ['hls', 'transcript', 'gpt_beats', 'word_boundaries', 'beat_script']
+# Cases run once per generated clip; the others once per run
+MEDIA_CASES = {'hls', 'transcript'}
+
+def directory_bytes(root):
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(root) for name in names)
+
+def source_url(env, case, duration, iteration):
+    """A distinct URL per case and run, so request logs tell the runs apart."""
+    return f"{env.base_url}/clip_{duration}.mp4?case={case}&run={iteration}"
+
+def run_hls(env, duration, iteration, args):
+    from bits.hls_transcoder import create_hls_stream
+    from bits.tracing import Trace
+    trace = Trace('hls', exporters=[])
+    storage_path = f'hls/bench-{duration}-{iteration}'
+    with trace.span('hls'):
+        create_hls_stream(source_url(env, 'hls', duration, iteration), storage_path, workers=args.workers)
+    output_bytes = directory_bytes(os.path.join(env.bucket.root, storage_path))
+    return {'units': duration, 'unit': 'media s', 'bytes': output_bytes, 'stages': trace.summary()['stages']}
+
+def run_transcript(env, duration, iteration, args):
+    from bits.transcripts import generate_transcript
+    bit_id = f'bench-{duration}-{iteration}'
+    video_url = source_url(env, 'transcript', duration, iteration)
+    env.db.collection('videos').document(bit_id).set({'storageUrl': video_url, 'status': 'processing'})
+    bit_ref = env.db.collection('bits').document(bit_id)
+    bit_ref.set({'storageUrl': video_url, 'videoId': bit_id, 'userId': 'bench'})
+    event = SimpleNamespace(id=f'event-{bit_id}', data=bit_ref.get())
+    generate_transcript(event)
+    bit = bit_ref.get().to_dict()
+    if 'transcript' not in bit:
+        raise RuntimeError("generate_transcript wrote no transcript")
+    return {'units': duration, 'unit': 'media s', 'words': len(bit['transcript']['words']),
+            'stages': bit['timings']['transcript']['stages']}
+
+def run_gpt_beats(env, duration, iteration, args):
+    from bits.comedy_structure import get_gpt_beats
+    word_timings = make_word_timings(args.words)
+    transcript = ' '.join(word['word'] for word in word_timings)
+    for call in range(args.iterations):
+        # A distinct transcript per call so the LLM cache never answers
+        result = get_gpt_beats(f"{transcript} run{iteration}-{call}", word_timings, env.client)
+        if len(result['beats']) != 2:
+            raise RuntimeError("get_gpt_beats did not return 2 beats")
+    return {'units': args.iterations, 'unit': 'calls'}
+
+def run_word_boundaries(env, duration, iteration, args):
+    from bits.beat_alignment import WordIndex
+    from bits.comedy_structure import find_word_boundaries
+    word_timings = make_word_timings(args.words)
+    index = WordIndex(word_timings)
+    scripts = [[word['word'] for word in word_timings[start:start + 12]]
+               for start in range(0, len(word_timings) - 12, max(len(word_timings) // 200, 1))]
+    for words in scripts:
+        find_word_boundaries(word_timings, words, index)
+    return {'units': len(scripts), 'unit': 'lookups'}
+
+def run_beat_script(env, duration, iteration, args):
+    from bits.script_generator import generate_beat_script
+    previous_beats = [{'type': 'setup', 'description': f'beat {i}'} for i in range(10)]
+    for call in range(args.iterations):
+        request = SimpleNamespace(data={'beatType': 'punchline', 'description': f'run {iteration}-{call}',
+                                        'previousBeats': previous_beats})
+        result = generate_beat_script(request)
+        if 'script' not in result:
+            raise RuntimeError(f"generate_beat_script failed: {result}")
+    return {'units': args.iterations, 'unit': 'calls'}
+
+RUNNERS = {
+    'hls': run_hls,
+    'transcript': run_transcript,
+    'gpt_beats': run_gpt_beats,
+    'word_boundaries': run_word_boundaries,
+    'beat_script': run_beat_script,
+}
+
+def run_case(case, duration, iteration, media_dir, args, results):
+    """Run one case in a fresh process so peak RSS and child CPU only cover that case."""
+    try:
+        server, base_url = serve_directory(media_dir)
+        with tempfile.TemporaryDirectory() as bucket_dir:
+            env = SimpleNamespace(db=MemoryFirestore(), client=StubOpenAI(args.latency),
+                                  bucket=FileBucket(bucket_dir), base_url=base_url)
+            install_fakes(env.db, env.client, env.bucket)
+            # The pipeline prints and logs every step; keep the report readable
+            output = sys.stdout if args.verbose else open(os.devnull, 'w')
+            with contextlib.redirect_stdout(output):
+                start = time.perf_counter()
+                result = RUNNERS[case](env, duration, iteration, args)
+                wall = time.perf_counter() - start
+        server.shutdown()
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        results.put({
+            **result,
+            'case': case,
+            'duration': duration,
+            'wall': wall,
+            'cpu': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+            # ru_maxrss is in KB on Linux; ffmpeg children are reported separately
+            'peakRssMb': own.ru_maxrss / 1024,
+            'childPeakRssMb': children.ru_maxrss / 1024,
+            'throughput': result['units'] / wall if wall else 0.0,
+            'llmCalls': sum(env.client.calls.values()),
+        })
+    except Exception:
+        results.put({'case': case, 'duration': duration, 'error': traceback.format_exc()})
+
+def case_key(result):
+    return f"{result['case']}@{result['duration']}s" if result['case'] in MEDIA_CASES else result['case']
+
+def print_result(result):
+    line = (f"{case_key(result):<20} wall={result['wall']:7.2f}s cpu={result['cpu']:7.2f}s "
+            f"rss={result['peakRssMb']:6.1f}MB ffmpeg_rss={result['childPeakRssMb']:6.1f}MB "
+            f"{result['throughput']:8.2f} {result['unit']}/s llm_calls={result['llmCalls']}")
+    print(line)
+    for name, stage in result.get('stages', {}).items():
+        extras = ' '.join(f"{key}={value}" for key, value in stage.items() if key != 'ms')
+        print(f"{'':<22}{name:<12} {stage['ms']:7d}ms {extras}")
+
+def compare(report, baseline_path, tolerance):
+    """Print cases whose best wall time regressed past tolerance; returns how many did."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = 0
+    for key, result in report.items():
+        if key not in baseline:
+            continue
+        ratio = result['wall'] / baseline[key]['wall'] if baseline[key]['wall'] else 1.0
+        marker = 'REGRESSION' if ratio > 1 + tolerance else 'ok'
+        regressions += marker != 'ok'
+        print(f"{key:<20} {baseline[key]['wall']:7.2f}s -> {result['wall']:7.2f}s ({ratio:5.2f}x) {marker}")
+    return regressions
+
+def benchmark(args):
+    logging.disable(logging.WARNING if not args.verbose else logging.NOTSET)
+    report = {}
+    failed = 0
+    with tempfile.TemporaryDirectory() as media_dir:
+        durations = args.durations if MEDIA_CASES & set(args.cases) else []
+        for duration in durations:
+            print(f"Generating {duration}s test clip...")
+            generate_clip(os.path.join(media_dir, f'clip_{duration}.mp4'), duration)
+
+        results = multiprocessing.Queue()
+        for case in args.cases:
+            for duration in (durations if case in MEDIA_CASES else [0]):
+                for iteration in range(args.repeats):
+                    process = multiprocessing.Process(target=run_case,
+                                                      args=(case, duration, iteration, media_dir, args, results))
+                    process.start()
+                    result = results.get()
+                    process.join()
+                    if 'error' in result:
+                        failed += 1
+                        print(f"{case_key(result)} failed:\n{result['error']}")
+                        continue
+                    print_result(result)
+                    # Keep the best run of each case, the least noisy for comparisons
+                    key = case_key(result)
+                    if key not in report or result['wall'] < report[key]['wall']:
+                        report[key] = result
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote results to {args.output}")
+    if args.baseline:
+        failed += compare(report, args.baseline, args.tolerance)
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bits pipeline end to end against local fakes")
+    parser.add_argument('--cases', nargs='*', choices=CASES, default=CASES)
+    parser.add_argument('--durations', type=int, nargs='*', default=[10, 30, 120],
+                        help="Lengths of the generated clips in seconds")
+    parser.add_argument('--repeats', type=int, default=1, help="Runs per case; the fastest is reported")
+    parser.add_argument('--latency', type=float, default=0.2, help="Stub OpenAI latency per call in seconds")
+    parser.add_argument('--iterations', type=int, default=20, help="Calls per run of the LLM cases")
+    parser.add_argument('--words', type=int, default=2000, help="Words in the synthetic transcript")
+    parser.add_argument('--workers', type=int, default=0, help="Segment-parallel HLS workers (0 for single pass)")
+    parser.add_argument('--output', help="Write the best run of each case to this JSON file")
+    parser.add_argument('--baseline', help="Earlier --output file to compare wall times against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before a case is flagged")
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own output")
+    args = parser.parse_args()
+    sys.exit(1 if benchmark(args) else 0)
@@ -0,0 +1,83 @@
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the Cloud Functions source importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import firebase_admin
+from firebase_admin import firestore
+from bits import reaction_histogram
+from bits.reaction_histogram import get_stats_ref, increment_histogram, read_histogram, rollup_histogram
+
+REACTION_TYPES = ['rofl', 'smirk', 'eyeroll', 'vomit']
+
+def transactional_write(db, bit_ref, reaction_type, timestamp):
+    """Read-modify-write of one stats doc, the way the app updates reactionCounts."""
+    stats_ref = get_stats_ref(bit_ref)
+
+    @firestore.transactional
+    def update(transaction):
+        snapshot = stats_ref.get(transaction=transaction)
+        counts = (snapshot.to_dict() or {}).get('counts', {}) if snapshot.exists else {}
+        key = reaction_histogram.bucket_key(timestamp)
+        type_counts = counts.get(reaction_type, {})
+        type_counts[key] = type_counts.get(key, 0) + 1
+        counts[reaction_type] = type_counts
+        transaction.set(stats_ref, {'counts': counts}, merge=True)
+
+    update(db.transaction())
+
+def sharded_write(db, bit_ref, reaction_type, timestamp):
+    increment_histogram(bit_ref, reaction_type, timestamp)
+    rollup_histogram(db, bit_ref)
+
+def run(name, write, db, writers, writes):
+    bit_ref = db.collection('contention_checks').document(uuid.uuid4().hex)
+    latencies = []
+    errors = 0
+
+    def worker(seed):
+        nonlocal errors
+        rng = random.Random(seed)
+        for _ in range(writes):
+            start = time.perf_counter()
+            try:
+                write(db, bit_ref, rng.choice(REACTION_TYPES), rng.uniform(0, 60))
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as executor:
+        list(executor.map(worker, range(writers)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] if latencies else 0
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    print(f"{name:>14}: {len(latencies) / wall:7.1f} writes/s, p50 {p50 * 1000:6.1f}ms, "
+          f"p95 {p95 * 1000:6.1f}ms, {errors} failed")
+    return bit_ref
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure reaction counter write contention on the Firestore emulator")
+    parser.add_argument('--writers', type=int, default=20, help="Concurrent writers (trigger instances)")
+    parser.add_argument('--writes', type=int, default=25, help="Writes per writer")
+    parser.add_argument('--shards', type=int, nargs='*', default=[1, 10], help="Shard counts to compare")
+    parser.add_argument('--project', default='demo-jocus')
+    args = parser.parse_args()
+    if not os.getenv('FIRESTORE_EMULATOR_HOST'):
+        sys.exit("Set FIRESTORE_EMULATOR_HOST (e.g. firebase emulators:start --only firestore)")
+    firebase_admin.initialize_app(options={'projectId': args.project})
+    db = firestore.client()
+
+    run('transaction', transactional_write, db, args.writers, args.writes)
+    for shards in args.shards:
+        reaction_histogram.SHARD_COUNT = shards
+        bit_ref = run(f'{shards} shard(s)', sharded_write, db, args.writers, args.writes)
+        total = sum(sum(counts) for counts in read_histogram(bit_ref).values())
+        print(f"{'':>14}  shards sum to {total} of {args.writers * args.writes} writes")
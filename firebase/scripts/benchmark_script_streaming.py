@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Make the Cloud Functions source importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+from openai import OpenAI
+import bits.llm_cache as llm_cache
+from bits.script_generator import generate_script, stream_script
+
+SCRIPT = ("So I finally joined a gym this year, and the first thing they do is take a photo of you "
+          "for the membership card, which is great, because now there is proof I was there once.")
+
+def make_handler(first_token_delay, token_delay):
+    """Fake OpenAI chat completions endpoint emitting SCRIPT word by word."""
+    tokens = [word + ' ' for word in SCRIPT.split()]
+    usage = {'prompt_tokens': 80, 'completion_tokens': len(tokens), 'total_tokens': 80 + len(tokens)}
+
+    class FakeModelHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            base = {'id': 'chatcmpl-fake', 'created': int(time.time()), 'model': body['model']}
+            time.sleep(first_token_delay)
+            if not body.get('stream'):
+                time.sleep(token_delay * len(tokens))
+                payload = json.dumps({**base, 'object': 'chat.completion', 'usage': usage, 'choices': [
+                    {'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': ''.join(tokens)}}
+                ]}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for token in tokens:
+                chunk = {**base, 'object': 'chat.completion.chunk', 'choices': [
+                    {'index': 0, 'finish_reason': None, 'delta': {'content': token}}
+                ]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(token_delay)
+            final = {**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+
+    return FakeModelHandler
+
+def benchmark(runs, first_token_delay, token_delay):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(first_token_delay, token_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(api_key='fake', base_url=f"http://127.0.0.1:{server.server_port}/v1")
+    # Memory-only cache; every run uses a new description so nothing is served from it
+    llm_cache._default_cache = llm_cache.LLMCache()
+
+    for run in range(runs):
+        start = time.perf_counter()
+        script, usage = generate_script('setup', f'blocking run {run}', [], client)
+        blocking = time.perf_counter() - start
+
+        final = None
+        for event in stream_script('setup', f'streaming run {run}', [], client):
+            final = event
+        print(f"run {run}: blocking first text {blocking * 1000:7.1f}ms | streaming first token "
+              f"{final['timeToFirstTokenMs']:6d}ms, complete {final['latencyMs']:6d}ms, "
+              f"{final['usage']['completionTokens']} tokens")
+    server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure time to first token against a local fake model server")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--first-token-delay', type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.02, help="Seconds between tokens")
+    args = parser.parse_args()
+    benchmark(args.runs, args.first_token_delay, args.token_delay)
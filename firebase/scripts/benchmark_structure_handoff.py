@@ -0,0 +1,75 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from fakes import StubOpenAI, make_word_timings
+from bits.comedy_structure import create_comedy_structure
+
+class DiscardingDocument:
+    """Firestore document stand-in that drops writes."""
+    id = 'stub'
+
+    def collection(self, name):
+        return self
+
+    def document(self, doc_id=None):
+        return self
+
+    def set(self, data):
+        pass
+
+def start_endpoint(client, db):
+    """Serve create_comedy_structure the way the old self-call reached analyze_joke_transcript."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['data']
+            result = create_comedy_structure(data['transcript'], data['wordTimings'], data['userId'], client, db)
+            body = json.dumps({'result': {'id': result['id']}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def benchmark(words, latency, repeats):
+    client = StubOpenAI(latency)
+    db = DiscardingDocument()
+    word_timings = make_word_timings(words)
+    transcript = ' '.join(word['word'] for word in word_timings)
+    server = start_endpoint(client, db)
+    url = f"http://127.0.0.1:{server.server_port}/analyze_joke_transcript"
+
+    timings = {'http self-call': [], 'in-process': []}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        payload = {'data': {'transcript': transcript, 'userId': 'bench', 'wordTimings': word_timings}}
+        requests.post(url, json=payload).raise_for_status()
+        timings['http self-call'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        create_comedy_structure(transcript, word_timings, 'bench', client, db)
+        timings['in-process'].append(time.perf_counter() - start)
+    server.shutdown()
+
+    for name, values in timings.items():
+        overhead = (min(values) - latency) * 1000
+        print(f"{name:<15} best={min(values) * 1000:.1f}ms overhead_vs_llm={overhead:.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the HTTP self-call and in-process structure handoff")
+    parser.add_argument('--words', type=int, default=2000, help="Words in the synthetic transcript")
+    parser.add_argument('--latency', type=float, default=0.05, help="Stub LLM latency in seconds")
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+    benchmark(args.words, args.latency, args.repeats)
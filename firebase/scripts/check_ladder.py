@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+
+# Make the Cloud Functions source importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+from bits.hls_ladder import plan_ladder
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
+
+def source(width, height, bitrate, codec='h264'):
+    return {
+        'video': {'codec': codec, 'width': width, 'height': height, 'bitrate': bitrate},
+        'audio': {'codec': 'aac', 'channels': 2, 'sampleRate': 44100, 'bitrate': 128000},
+    }
+
+def modes(ladder):
+    return {rung['name']: rung['video'] for rung in ladder}
+
+def sizes(ladder):
+    return {rung['name']: (rung['width'], rung['height']) for rung in ladder}
+
+def run_checks():
+    landscape = plan_ladder(source(1280, 720, 1800000))
+    check(modes(landscape) == {'240p': 'encode', '480p': 'encode', '720p': 'copy'},
+          "landscape 720p source at the rung bitrate copies its 720p rung")
+    check(sizes(landscape)['480p'] == (854, 480), "landscape rungs stay landscape")
+
+    portrait = plan_ladder(source(720, 1280, 1800000))
+    check(modes(portrait) == {'240p': 'encode', '480p': 'encode', '720p': 'copy'},
+          "portrait 720x1280 source copies its 720p rung")
+    check(sizes(portrait) == {'240p': (240, 426), '480p': (480, 854), '720p': (720, 1280)},
+          "portrait rungs are scaled to portrait sizes")
+
+    phone = plan_ladder(source(1080, 1920, 8000000))
+    check(all(mode == 'encode' for mode in modes(phone).values()),
+          "1080x1920 phone upload above every rung's bitrate is re-encoded")
+    check(modes(plan_ladder(source(720, 1280, 1800000, codec='hevc')))['720p'] == 'encode',
+          "portrait HEVC source is re-encoded")
+    check(modes(plan_ladder(source(1280, 720, 5000000)))['720p'] == 'encode',
+          "source far above the rung bitrate is re-encoded")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the HLS ladder plan for landscape and portrait sources")
+    parser.parse_args()
+    run_checks()
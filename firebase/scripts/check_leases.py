@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the Cloud Functions source importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import firebase_admin
+from firebase_admin import firestore
+from bits.leases import claim_lease
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
+
+def run_checks(db, deliveries):
+    videos = db.collection('lease_checks')
+
+    # Concurrent redeliveries of one event plus deliveries of other events for the same video
+    doc_ref = videos.document(uuid.uuid4().hex)
+    doc_ref.set({'status': 'processing'})
+    event_ids = ['event-1'] * (deliveries // 2) + [f'event-{i}' for i in range(2, deliveries - deliveries // 2 + 2)]
+    with ThreadPoolExecutor(max_workers=deliveries) as executor:
+        leases = list(executor.map(lambda event_id: claim_lease(db, doc_ref, 'hls', event_id), event_ids))
+    claimed = [lease for lease in leases if lease]
+    check(len(claimed) == 1, f"{deliveries} concurrent deliveries -> {len(claimed)} claim")
+
+    check(claimed[0].complete(), "owner marks the lease done")
+    check(claim_lease(db, doc_ref, 'hls', claimed[0].event_id) is None, "redelivery after completion is skipped")
+    check(claim_lease(db, doc_ref, 'hls', 'event-late') is None, "a different event after completion is skipped")
+    check(claim_lease(db, doc_ref, 'transcript', 'event-1') is not None, "pipelines hold independent leases")
+
+    # A crashed worker's lease expires and is taken over
+    doc_ref = videos.document(uuid.uuid4().hex)
+    doc_ref.set({'status': 'processing'})
+    crashed = claim_lease(db, doc_ref, 'hls', 'event-crashed', lease_seconds=1)
+    check(claim_lease(db, doc_ref, 'hls', 'event-retry') is None, "live lease blocks other events")
+    time.sleep(1.5)
+    retry = claim_lease(db, doc_ref, 'hls', 'event-retry')
+    check(retry is not None, "expired lease is taken over")
+    check(not crashed.complete(), "the crashed owner can no longer complete it")
+    lease = doc_ref.get().to_dict()['leases']['hls']
+    check(lease['owner'] == 'event-retry' and lease['attempts'] == 2, "takeover is recorded as attempt 2")
+
+    # A failed worker releases its lease for an immediate retry
+    check(retry.release('transcode failed'), "owner releases the lease after a failure")
+    check(claim_lease(db, doc_ref, 'hls', 'event-retry') is not None, "released lease is claimable again")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check bit-trigger leases against the Firestore emulator")
+    parser.add_argument('--deliveries', type=int, default=16, help="Concurrent deliveries racing for one lease")
+    parser.add_argument('--project', default='demo-jocus')
+    args = parser.parse_args()
+    if not os.getenv('FIRESTORE_EMULATOR_HOST'):
+        sys.exit("Set FIRESTORE_EMULATOR_HOST (e.g. firebase emulators:start --only firestore)")
+    firebase_admin.initialize_app(options={'projectId': args.project})
+    run_checks(firestore.client(), args.deliveries)
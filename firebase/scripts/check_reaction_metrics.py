@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+
+# Make the Cloud Functions source importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+from bits.reaction_metrics import ReactionMetrics
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
+
+def laughs_at(*buckets, size=12):
+    """A rofl histogram with one laugh in each given 1-second bucket."""
+    counts = [0] * size
+    for bucket in buckets:
+        counts[bucket] += 1
+    return {'rofl': counts}
+
+def beat_counts(timeline, histogram):
+    return [int(count) for count in ReactionMetrics.from_histogram(timeline, histogram, 1).beat_counts()]
+
+def run_checks():
+    # Boundaries inside a bucket: the bucket goes to the beat holding its midpoint, never both
+    timeline = [{'type': 'setup', 'startTime': 0.0, 'endTime': 3.7},
+                {'type': 'punchline', 'startTime': 3.7, 'endTime': 8.2}]
+    check(beat_counts(timeline, laughs_at(3)) == [1, 0], "a straddling bucket is counted for one beat only")
+    check(beat_counts(timeline, laughs_at(*range(8))) == [4, 4], "every bucket inside the structure is counted once")
+
+    # A punchline shorter than a bucket still gets the bucket it starts in
+    timeline = [{'type': 'setup', 'startTime': 0.0, 'endTime': 6.2},
+                {'type': 'punchline', 'startTime': 6.2, 'endTime': 6.8},
+                {'type': 'tag', 'startTime': 6.8, 'endTime': 10.0}]
+    check(beat_counts(timeline, laughs_at(6, 6)) == [0, 2, 0], "a sub-bucket punchline keeps its laughs")
+    check(beat_counts(timeline, laughs_at(5, 7)) == [1, 0, 1], "neighbours keep their own buckets")
+
+    # Template structures laid end to end by durationSeconds
+    timeline = [{'type': 'setup', 'durationSeconds': 4}, {'type': 'punchline', 'durationSeconds': 2},
+                {'type': 'callback', 'durationSeconds': 2}]
+    metrics = ReactionMetrics.from_histogram(timeline, laughs_at(1, 4, 5, 6, 11), 1).metrics()
+    check(metrics['beatReactionCounts'] == [1, 2, 1], "template beats count the laughs in their spans")
+    check(metrics['reactionCount'] == 5, "laughs after the last beat still count towards the total")
+    check(metrics['callbackEffectiveness'] == 0.5, "callback rate is compared with the punchline's")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check how reaction metrics assign laughs to beats")
+    parser.parse_args()
+    run_checks()
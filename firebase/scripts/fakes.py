@@ -0,0 +1,277 @@
+import copy
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+# Make the Cloud Functions source importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+# Canned model output; the beat scripts align to the words make_word_timings generates
+STUB_BEATS_RESPONSE = json.dumps({
+    'title': 'Stub Bit',
+    'description': 'A stubbed comedy bit',
+    'beats': [
+        {'type': 'setup', 'description': 'setup', 'script': 'word0 word1', 'durationSeconds': 5},
+        {'type': 'punchline', 'description': 'punchline', 'script': 'word2 word3', 'durationSeconds': 2},
+    ],
+})
+STUB_SCRIPT = "So I finally joined a gym, and now there is proof I was there once."
+
+# Opus at the extractor's 24 kbit/s, used to turn an upload's size back into seconds of speech
+OPUS_BYTES_PER_SECOND = 3000
+WORDS_PER_SECOND = 2.5
+
+def generate_clip(path, duration, width=1280, height=720):
+    """Generate a synthetic clip with ffmpeg's testsrc video and sine audio."""
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=duration={duration}:size={width}x{height}:rate=30',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac',
+        '-shortest', path
+    ], check=True)
+
+def make_word_timings(count, spacing=0.4):
+    """Whisper-style word timings word0, word1, ... that the stub beats align to."""
+    return [{'word': f'word{i}', 'start': round(i * spacing, 2), 'end': round(i * spacing + spacing * 0.75, 2)}
+            for i in range(count)]
+
+def chat_response(content, prompt_tokens=80, completion_tokens=40):
+    """A chat completion shaped like the OpenAI SDK's response object."""
+    message = SimpleNamespace(content=content)
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+class ReplayChatClient:
+    """OpenAI-shaped client replaying recorded responses with a fixed latency."""
+
+    def __init__(self, responses, latency=0.0):
+        self.responses = list(responses)
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **params):
+        content = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        time.sleep(self.latency)
+        return chat_response(content)
+
+class StubOpenAI:
+    """
+    Stands in for the OpenAI client: every call sleeps for a fixed latency.
+    Chat calls asking for the beats schema get STUB_BEATS_RESPONSE, others STUB_SCRIPT;
+    transcriptions return word0, word1, ... spread over the uploaded audio's length.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {'chat': 0, 'transcriptions': 0}
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self.transcribe))
+
+    def _count(self, name):
+        with self.lock:
+            self.calls[name] += 1
+
+    def create(self, model, messages, **params):
+        self._count('chat')
+        time.sleep(self.latency)
+        return chat_response(STUB_BEATS_RESPONSE if 'response_format' in params else STUB_SCRIPT)
+
+    def transcribe(self, file, model, **params):
+        self._count('transcriptions')
+        _, audio_file = file
+        seconds = len(audio_file.read()) / OPUS_BYTES_PER_SECOND
+        time.sleep(self.latency)
+        words = make_word_timings(max(int(seconds * WORDS_PER_SECOND), 4), 1 / WORDS_PER_SECOND)
+        return {'text': ' '.join(word['word'] for word in words), 'words': words, 'language': 'en'}
+
+def serve_directory(root):
+    """Serve root over HTTP on a free local port; returns (server, base URL)."""
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+class FileBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.cache_control = None
+        self.content_type = None
+
+    def upload_from_filename(self, filename, content_type=None, predefined_acl=None):
+        destination = os.path.join(self.bucket.root, self.name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(filename, destination)
+
+class FileBucket:
+    """Cloud Storage bucket stand-in that writes blobs under a local directory."""
+
+    def __init__(self, root, name='local-bucket'):
+        self.root = root
+        self.name = name
+
+    def blob(self, name):
+        return FileBlob(self, name)
+
+def _set_path(data, path, value):
+    """Apply a dotted field path the way Firestore's update() does."""
+    *parents, leaf = path.split('.')
+    for key in parents:
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+        data = data[key]
+    data[leaf] = value
+
+class MemorySnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+class MemoryDocument:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    def collection(self, name):
+        return MemoryCollection(self.db, f"{self.path}/{name}")
+
+    def get(self, transaction=None):
+        with self.db.lock:
+            return MemorySnapshot(self, copy.deepcopy(self.db.docs.get(self.path)))
+
+    def set(self, data, merge=False):
+        with self.db.lock:
+            current = self.db.docs.get(self.path) if merge else None
+            self.db.docs[self.path] = {**(current or {}), **copy.deepcopy(data)}
+
+    def update(self, data):
+        with self.db.lock:
+            if self.path not in self.db.docs:
+                raise KeyError(f"No document to update: {self.path}")
+            for path, value in data.items():
+                _set_path(self.db.docs[self.path], path, copy.deepcopy(value))
+
+    def delete(self):
+        with self.db.lock:
+            self.db.docs.pop(self.path, None)
+
+class MemoryQuery:
+    def __init__(self, collection, filters=(), count=None):
+        self.collection = collection
+        self.filters = list(filters)
+        self.count = count
+
+    def where(self, field, op, value):
+        if op != '==':
+            raise NotImplementedError(f"MemoryFirestore only supports == filters, not {op}")
+        return MemoryQuery(self.collection, self.filters + [(field, value)], self.count)
+
+    def limit(self, count):
+        return MemoryQuery(self.collection, self.filters, count)
+
+    def get(self):
+        matches = [snapshot for snapshot in self.collection.stream()
+                   if all(snapshot.to_dict().get(field) == value for field, value in self.filters)]
+        return matches[:self.count] if self.count is not None else matches
+
+    def stream(self):
+        return iter(self.get())
+
+class MemoryCollection(MemoryQuery):
+    def __init__(self, db, path):
+        super().__init__(self)
+        self.db = db
+        self.path = path
+
+    def document(self, doc_id=None):
+        return MemoryDocument(self.db, f"{self.path}/{doc_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, data):
+        doc_ref = self.document()
+        doc_ref.set(data)
+        return None, doc_ref
+
+    def list_documents(self):
+        prefix = self.path + '/'
+        with self.db.lock:
+            paths = [path for path in self.db.docs if path.startswith(prefix) and '/' not in path[len(prefix):]]
+        return [MemoryDocument(self.db, path) for path in paths]
+
+    def stream(self):
+        return iter([doc_ref.get() for doc_ref in self.list_documents()])
+
+class MemoryTransaction:
+    """Writes apply immediately; isolation comes from the database lock held by transactional()."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def set(self, doc_ref, data, merge=False):
+        doc_ref.set(data, merge=merge)
+
+    def update(self, doc_ref, data):
+        doc_ref.update(data)
+
+    def delete(self, doc_ref):
+        doc_ref.delete()
+
+class MemoryFirestore:
+    """
+    In-memory Firestore covering what the bits pipeline uses: documents, subcollections,
+    dotted-path updates, equality queries and transactions (serialized on one lock).
+    Sentinels such as SERVER_TIMESTAMP are stored as given.
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.RLock()
+
+    def collection(self, name):
+        return MemoryCollection(self, name)
+
+    def transaction(self):
+        return MemoryTransaction(self)
+
+    def transactional(self, fn):
+        """Replacement for firestore.transactional: runs fn under the database lock."""
+        def run(transaction, *args, **kwargs):
+            with self.lock:
+                return fn(transaction, *args, **kwargs)
+        return run
+
+def install_fakes(db=None, openai_client=None, bucket=None):
+    """
+    Point the pipeline's shared clients at the fakes.
+    The process-wide client memos are filled in directly, the LLM cache becomes memory-only
+    and leases use MemoryFirestore.transactional, so nothing reaches a real service.
+    """
+    from bits import clients, leases, llm_cache
+    if db is not None:
+        clients._firestore_client = db
+        leases.firestore = SimpleNamespace(transactional=db.transactional)
+    if openai_client is not None:
+        clients._openai_client = openai_client
+    if bucket is not None:
+        clients._buckets[clients.DEFAULT_BUCKET] = bucket
+    llm_cache._default_cache = llm_cache.LLMCache()
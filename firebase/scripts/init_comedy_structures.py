@@ -1,6 +1,10 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
+import argparse
+import hashlib
+import json
 import os
+import re
 from datetime import datetime
 
 # Sample comedy structures data
@@ -170,7 +174,80 @@ COMEDY_STRUCTURES = [
     }
 ]
 
-def init_firestore():
+# Firestore allows at most 500 writes per batch
+BATCH_SIZE = 500
+
+def template_id(structure):
+    """Stable document ID derived from the template's title, so edits keep the same ID."""
+    return re.sub(r'[^a-z0-9]+', '-', structure['title'].lower()).strip('-')
+
+def content_hash(structure):
+    """Hash of the template content, stored with the document to detect changes."""
+    return hashlib.sha256(json.dumps(structure, sort_keys=True).encode('utf-8')).hexdigest()
+
+def plan_sync(stored, structures):
+    """
+    Diff the templates against stored {id: contentHash}.
+    Returns (creates, updates, deletes) as lists of IDs, with unchanged templates left out.
+    """
+    desired = {}
+    for structure in structures:
+        structure_id = template_id(structure)
+        if structure_id in desired:
+            raise ValueError(f"Duplicate template title: {structure['title']}")
+        desired[structure_id] = content_hash(structure)
+    creates = [structure_id for structure_id in desired if structure_id not in stored]
+    updates = [structure_id for structure_id, digest in desired.items()
+               if structure_id in stored and stored[structure_id] != digest]
+    deletes = [structure_id for structure_id in stored if structure_id not in desired]
+    return creates, updates, deletes
+
+def sync_structures(db, structures=COMEDY_STRUCTURES, dry_run=False):
+    """Apply only created, changed and removed templates, in batched writes."""
+    collection_ref = db.collection('comedy_structures')
+    
+    # Only hashes and creation times are read, not whole documents
+    stored = {}
+    created_at = {}
+    for doc in collection_ref.select(['contentHash', 'createdAt']).stream():
+        data = doc.to_dict() or {}
+        stored[doc.id] = data.get('contentHash')
+        created_at[doc.id] = data.get('createdAt')
+    
+    creates, updates, deletes = plan_sync(stored, structures)
+    by_id = {template_id(structure): structure for structure in structures}
+    for label, ids in (('Create', creates), ('Update', updates), ('Delete', deletes)):
+        for structure_id in ids:
+            print(f"{label}: {structure_id}")
+    print(f"{len(creates)} to create, {len(updates)} to update, {len(deletes)} to delete, "
+          f"{len(structures) - len(creates) - len(updates)} unchanged")
+    if dry_run:
+        return creates, updates, deletes
+    
+    now = datetime.utcnow()
+    writes = []
+    for structure_id in creates + updates:
+        structure = by_id[structure_id]
+        writes.append(('set', structure_id, {
+            **structure,
+            'contentHash': content_hash(structure),
+            # Keep the original creation time when a template changes
+            'createdAt': created_at.get(structure_id) or now,
+            'updatedAt': now,
+        }))
+    writes.extend(('delete', structure_id, None) for structure_id in deletes)
+    
+    for i in range(0, len(writes), BATCH_SIZE):
+        batch = db.batch()
+        for operation, structure_id, data in writes[i:i + BATCH_SIZE]:
+            if operation == 'set':
+                batch.set(collection_ref.document(structure_id), data)
+            else:
+                batch.delete(collection_ref.document(structure_id))
+        batch.commit()
+    return creates, updates, deletes
+
+def init_firestore(dry_run=False):
     # Get the path to the service account key relative to this script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     key_path = os.path.join(script_dir, '..', 'service-account-key.json')
@@ -182,29 +259,14 @@ def init_firestore():
     # Get Firestore client
     db = firestore.client()
     
-    # Reference to comedy_structures collection
-    collection_ref = db.collection('comedy_structures')
-    
-    # First, delete existing documents
-    docs = collection_ref.stream()
-    for doc in docs:
-        print(f"Deleting existing document: {doc.id}")
-        doc.reference.delete()
-    
-    # Add new structures
-    for structure in COMEDY_STRUCTURES:
-        # Add timestamp
-        structure['createdAt'] = datetime.utcnow()
-        
-        # Add to Firestore
-        doc_ref = collection_ref.add(structure)
-        print(f"Added comedy structure: {structure['title']} (ID: {doc_ref[1].id})")
-    
-    print("\nFirestore initialization complete!")
-    print(f"Added {len(COMEDY_STRUCTURES)} comedy structures")
+    sync_structures(db, dry_run=dry_run)
+    print("\nFirestore sync complete!" if not dry_run else "\nDry run, nothing written")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync comedy structure templates to Firestore")
+    parser.add_argument('--dry-run', action='store_true', help="Show the diff without writing")
+    args = parser.parse_args()
     try:
-        init_firestore()
+        init_firestore(args.dry_run)
     except Exception as e:
         print(f"Error initializing Firestore: {e}")
@@ -0,0 +1,66 @@
+import argparse
+import os
+import subprocess
+import sys
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions')
+
+# Module each deployed function imports on its first invocation (see functions/main.py)
+HANDLER_MODULES = {
+    'generate_transcript': 'bits.transcripts',
+    'on_bit_created': 'bits.hls_transcoder',
+    'analyze_joke_transcript': 'bits.comedy_structure',
+    'generate_beat_script': 'bits.script_generator',
+    'generate_timeline_scripts': 'bits.script_generator',
+    'stream_beat_script': 'bits.script_generator',
+    'on_reaction_created': 'bits.reaction_histogram',
+    'on_reaction_deleted': 'bits.reaction_histogram',
+    'sweep_pending_histograms': 'bits.reaction_histogram',
+}
+
+# Third-party packages worth calling out when a handler pulls them in
+HEAVY_PACKAGES = ['moviepy', 'ffmpeg', 'openai', 'requests', 'numpy', 'google.cloud.firestore',
+                  'google.cloud.storage', 'firebase_admin', 'firebase_functions']
+
+def profile_import(module):
+    """Import module in a fresh interpreter with -X importtime; returns {module: (self_us, cumulative_us)}."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=FUNCTIONS_DIR, capture_output=True, text=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    if result.returncode != 0:
+        print(f"import {module} failed: {result.stderr.strip().splitlines()[-1]}")
+        return None
+    return timings
+
+def report(name, module, top):
+    timings = profile_import(module)
+    if timings is None:
+        return
+    total = sum(self_us for self_us, _ in timings.values())
+    print(f"{name} ({module}): {total / 1000:.1f}ms across {len(timings)} modules")
+    for package in HEAVY_PACKAGES:
+        if package in timings:
+            print(f"  pulls in {package:<24} {timings[package][1] / 1000:8.1f}ms cumulative")
+    # Top-level packages ranked by the time their whole subtree took
+    roots = {}
+    for module_name, (self_us, _) in timings.items():
+        root = module_name.split('.')[0]
+        roots[root] = roots.get(root, 0) + self_us
+    for root, self_us in sorted(roots.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {root:<32} {self_us / 1000:8.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report per-module import cost of each function's cold start")
+    parser.add_argument('functions', nargs='*', default=list(HANDLER_MODULES) + ['main'],
+                        help="Function names (or 'main' for the entry point itself)")
+    parser.add_argument('--top', type=int, default=10, help="Number of top-level packages to list")
+    args = parser.parse_args()
+    for function in args.functions:
+        report(function, HANDLER_MODULES.get(function, function), args.top)
@@ -3,6 +3,7 @@ import 'package:cloud_firestore/cloud_firestore.dart';
 enum VideoStatus {
   initial,
   processing,
+  partial,
   ready,
   failed
 }
@@ -14,6 +15,7 @@ class Video {
   final String userId;
   final String storageUrl;
   final String? thumbnailUrl;
+  final String? thumbnailsVttUrl;
   final int duration;
   final DateTime uploadDate;
   final VideoStatus status;
@@ -27,6 +29,7 @@ class Video {
     required this.userId,
     required this.storageUrl,
     this.thumbnailUrl,
+    this.thumbnailsVttUrl,
     required this.duration,
     required this.uploadDate,
     required this.status,
@@ -43,6 +46,7 @@ class Video {
       userId: data['userId'] ?? '',
       storageUrl: data['storageUrl'] ?? '',
       thumbnailUrl: data['thumbnailUrl'],
+      thumbnailsVttUrl: data['thumbnailsVttUrl'],
       duration: data['duration'] ?? 0,
       uploadDate: (data['uploadDate'] as Timestamp).toDate(),
       status: VideoStatus.values.firstWhere(
@@ -61,6 +65,7 @@ class Video {
       'userId': userId,
       'storageUrl': storageUrl,
       'thumbnailUrl': thumbnailUrl,
+      'thumbnailsVttUrl': thumbnailsVttUrl,
       'duration': duration,
       'uploadDate': Timestamp.fromDate(uploadDate),
       'status': status.toString().split('.').last,
@@ -74,6 +79,7 @@ class Video {
     String? description,
     String? storageUrl,
     String? thumbnailUrl,
+    String? thumbnailsVttUrl,
     VideoStatus? status,
     bool? isProcessed,
     Map<String, dynamic>? metadata,
@@ -85,6 +91,7 @@ class Video {
       userId: userId,
       storageUrl: storageUrl ?? this.storageUrl,
       thumbnailUrl: thumbnailUrl ?? this.thumbnailUrl,
+      thumbnailsVttUrl: thumbnailsVttUrl ?? this.thumbnailsVttUrl,
       duration: duration,
       uploadDate: uploadDate,
       status: status ?? this.status,
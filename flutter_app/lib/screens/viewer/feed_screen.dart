@@ -79,7 +79,7 @@ class _FeedScreenState extends State<FeedScreen> {
       
       var query = FirebaseFirestore.instance
           .collection('videos')
-          .where('status', isEqualTo: 'ready')
+          .where('status', whereIn: ['ready', 'partial'])
           .orderBy('uploadDate', descending: true)
           .limit(_pageSize);
 
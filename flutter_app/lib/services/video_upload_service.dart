@@ -1,4 +1,6 @@
+import 'dart:convert';
 import 'dart:io';
+import 'package:crypto/crypto.dart';
 import 'package:firebase_storage/firebase_storage.dart';
 import 'package:cloud_firestore/cloud_firestore.dart';
 import '../models/video.dart';
@@ -16,7 +18,7 @@ class VideoUploadService {
     }
   }
 
-  Future<String> _uploadToFirebaseStorage(File video, String userId) async {
+  Future<(String, String)> _uploadToFirebaseStorage(File video, String userId) async {
     final fileName = 'video_${DateTime.now().millisecondsSinceEpoch}.mp4';
     final ref = _storage.ref().child('videos/$userId/$fileName');
     
@@ -28,7 +30,7 @@ class VideoUploadService {
     if (snapshot.state == TaskState.success) {
       // Wait a few seconds to ensure the file is fully available
       await Future.delayed(const Duration(seconds: 5));
-      return await ref.getDownloadURL();
+      return (await ref.getDownloadURL(), ref.fullPath);
     } else {
       throw Exception('Failed to upload video to Firebase Storage');
     }
@@ -45,13 +47,14 @@ class VideoUploadService {
       await validateVideo(videoFile);
 
       // Upload video to Firebase Storage and wait for completion
-      final videoUrl = await _uploadToFirebaseStorage(videoFile, userId);
+      final (videoUrl, storagePath) = await _uploadToFirebaseStorage(videoFile, userId);
 
       // Start a batch write
       final batch = _firestore.batch();
 
-      // Create video document
-      final videoDoc = _firestore.collection('videos').doc();
+      // Create video document, keyed by a hash of its storage path so the backend can get it directly
+      // (must match video_id_for_path in firebase/functions/bits/videos.py)
+      final videoDoc = _firestore.collection('videos').doc(sha256.convert(utf8.encode(storagePath)).toString());
       batch.set(videoDoc, {
         'title': title,
         'description': description,
@@ -77,7 +80,7 @@ class VideoUploadService {
           'duration': 0,
         },
       );
-      batch.set(bitDoc, bit.toFirestore());
+      batch.set(bitDoc, {...bit.toFirestore(), 'videoId': videoDoc.id});
 
       // Create initial analytics document
       final analyticsDoc = bitDoc.collection('analytics').doc('stats');